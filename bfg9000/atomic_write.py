@@ -0,0 +1,31 @@
+import os
+import stat
+import tempfile
+
+def _default_mode(path):
+    # Keep the permissions of the file we're replacing. Otherwise, use what
+    # open() would have given a new file.
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+def atomic_write(path, data, mode=None):
+    # Write to a temporary file and move it into place, so that anyone reading
+    # `path` (or a run that crashes partway through) never sees half a file.
+    # mkstemp() makes the file private to us, so set the mode we want before
+    # moving it.
+    dirname = os.path.dirname(path) or '.'
+    fd, tmp = tempfile.mkstemp(dir=dirname, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.chmod(tmp, _default_mode(path) if mode is None else mode)
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+    except:
+        os.remove(tmp)
+        raise
@@ -1,15 +1,128 @@
+import importlib
+import os
+import sys
 from collections import OrderedDict
-from pkg_resources import iter_entry_points, DistributionNotFound
+from contextlib import contextmanager
+from cStringIO import StringIO
+from ConfigParser import RawConfigParser, Error as ConfigError
+
+_group = 'bfg9000.backends'
+_entry_points = None
+_loaded_backends = {}
+
+def _dist_info_dirs(base):
+    try:
+        names = sorted(os.listdir(base))
+    except OSError:
+        return
+    for i in names:
+        if i.endswith('.egg-info') or i.endswith('.dist-info'):
+            yield i, os.path.join(base, i)
+        elif i.endswith('.egg'):
+            yield i, os.path.join(base, i, 'EGG-INFO')
+
+def _scan_entry_points(group):
+    # Read the entry points straight from the installed distributions'
+    # metadata. This is much faster than importing pkg_resources, which we'd
+    # otherwise pay for on every run (including regenerations).
+    result = OrderedDict()
+    seen = set()
+    for base in sys.path:
+        for name, path in _dist_info_dirs(base or '.'):
+            project = os.path.splitext(name)[0].split('-')[0].lower()
+            filename = os.path.join(path, 'entry_points.txt')
+            if project in seen or not os.path.isfile(filename):
+                continue
+            seen.add(project)
+
+            parser = RawConfigParser()
+            parser.optionxform = str
+            try:
+                parser.read(filename)
+                if parser.has_section(group):
+                    for k, v in parser.items(group):
+                        result.setdefault(k, v.split('[')[0].strip())
+            except ConfigError:
+                pass
+    return result
+
+def _pkg_resources_entry_points(group):
+    from pkg_resources import iter_entry_points
+    return OrderedDict((i.name, i.module_name + (
+        ':' + '.'.join(i.attrs) if i.attrs else ''
+    )) for i in iter_entry_points(group))
+
+def _get_entry_points():
+    global _entry_points
+    if _entry_points is None:
+        _entry_points = _scan_entry_points(_group)
+        if not _entry_points:
+            # We couldn't read the metadata directly (e.g. because bfg9000 is
+            # installed as a zipped egg), so fall back to pkg_resources.
+            _entry_points = _pkg_resources_entry_points(_group)
+    return _entry_points
+
+def list_backends():
+    return _get_entry_points().keys()
+
+def get_backend(name):
+    if name not in _loaded_backends:
+        module, _, attrs = _get_entry_points()[name].partition(':')
+        backend = importlib.import_module(module)
+        for i in attrs.split('.') if attrs else []:
+            backend = getattr(backend, i)
+        _loaded_backends[name] = backend
+    return _loaded_backends[name]
+
+def _start_probes(names):
+    # Let each backend start probing for its tools before we load any of them,
+    # so that the probes can all run at once.
+    for name in names:
+        module = _get_entry_points()[name].partition(':')[0]
+        package = module.rpartition('.')[0]
+        try:
+            start_probes = getattr(importlib.import_module(package),
+                                   'start_probes', None)
+        except (ImportError, ValueError):
+            continue
+        if start_probes:
+            start_probes()
+
+def usable_backend(name):
+    try:
+        backend = get_backend(name)
+    except ImportError:
+        # The backend's optional dependencies aren't installed.
+        return None
+    return backend if backend.priority >= 0 else None
 
 def get_backends():
     backends = []
-    for i in iter_entry_points('bfg9000.backends'):
-        try:
-            backend = i.load()
-            if backend.priority >= 0:
-                backends.append((i.name, backend))
-        except DistributionNotFound:
-            pass
+    _start_probes(list_backends())
+    for name in list_backends():
+        backend = usable_backend(name)
+        if backend:
+            backends.append((name, backend))
 
     backends.sort(key=lambda x: x[1].priority, reverse=True)
     return OrderedDict(backends)
+
+@contextmanager
+def output_file(path):
+    # Only rewrite the build file if its contents changed, so that anything
+    # watching it (e.g. an editor) isn't disturbed needlessly. We still touch
+    # it so the build system knows it's up to date.
+    out = StringIO()
+    yield out
+    data = out.getvalue()
+    try:
+        with open(path) as f:
+            unchanged = f.read() == data
+    except IOError:
+        unchanged = False
+
+    if unchanged:
+        os.utime(path, None)
+    else:
+        with open(path, 'w') as f:
+            f.write(data)
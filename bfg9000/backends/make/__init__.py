@@ -1,14 +1,21 @@
 import re
-import subprocess
 
 from ...platforms import which
+from ...probe_cache import check_output, prefetch
 
-version = None
-try:
-    make = which(['make', 'gmake'])
-    output = subprocess.check_output([make, '--version'])
+def _version_args():
+    return [which(['make', 'gmake']), '--version']
+
+def start_probes():
+    try:
+        prefetch(_version_args())
+    except IOError:
+        pass
+
+def get_version():
+    try:
+        output = check_output(_version_args())
+    except IOError:
+        return None
     m = re.match(r'GNU Make ([\d\.]+)', output)
-    if m:
-        version = m.group(1)
-except IOError:
-    pass
+    return m.group(1) if m else None
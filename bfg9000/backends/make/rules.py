@@ -2,13 +2,16 @@ import os
 from cStringIO import StringIO
 from itertools import chain
 
-from . import version
+from . import get_version
+from .. import output_file
 from .syntax import *
 from ... import path
 from ... import safe_str
 from ... import shell
 from ... import iterutils
 from ...builtins import find
+from ...memory import tracker
+from ...timings import timer
 
 Path = path.Path
 
@@ -19,6 +22,7 @@ def rule_handler(rule_name):
         return fn
     return decorator
 
+version = get_version()
 priority = 2 if version is not None else 0
 
 def write(env, build_inputs):
@@ -29,14 +33,19 @@ def write(env, build_inputs):
 
     all_rule(build_inputs.get_default_targets(), buildfile)
     for e in build_inputs.edges:
-        _rule_handlers[type(e).__name__](e, build_inputs, buildfile, env)
+        name = type(e).__name__
+        with timer.timed('rules', name):
+            _rule_handlers[name](e, build_inputs, buildfile, env)
     install_rule(build_inputs.install_targets, buildfile, env)
     test_rule(build_inputs.tests, buildfile, env)
     directory_rule(buildfile, env)
-    regenerate_rule(build_inputs.find_dirs, buildfile, env)
+    regenerate_rule(build_inputs, buildfile, env)
 
-    with open(env.builddir.append('Makefile').string(), 'w') as out:
+    tracker.snapshot('generate')
+    with timer.timed('phases', 'write'), \
+         output_file(env.builddir.append('Makefile').string()) as out:
         buildfile.write(out)
+        timer.count('bytes_written', 'Makefile', out.tell())
 
 def cmd_var(cmd, buildfile):
     name = cmd.command_var.upper()
@@ -165,20 +174,28 @@ def directory_rule(buildfile, env):
         ]
     )
 
-def regenerate_rule(find_dirs, buildfile, env):
+def regenerate_rule(build_inputs, buildfile, env):
     bfg9000 = cmd_var(env.tool('bfg9000'), buildfile)
     bfgpath = Path('build.bfg', path.Root.srcdir)
-    extra_deps = []
+    extra_deps = [Path(i, path.Root.srcdir) for i in build_inputs.bfg_files]
+    regenerate = [bfg9000, '--regenerate']
 
-    if find_dirs:
+    if build_inputs.find_dirs:
         find.write_depfile(env.builddir.append(find.depfile_name).string(),
-                           'Makefile', find_dirs, makeify=True)
+                           'Makefile', build_inputs.find_dirs, makeify=True)
+        find.write_queryfile(
+            env.builddir.append(find.queryfile_name).string(), 'Makefile',
+            [env.srcdir.append(i).string() for i in
+             ['build.bfg'] + build_inputs.bfg_files],
+            build_inputs.find_queries, build_inputs.find_dirs
+        )
         buildfile.include(find.depfile_name)
+        regenerate.append('--only-if-changed')
 
     buildfile.rule(
         target=Path('Makefile'),
         deps=[bfgpath] + extra_deps,
-        recipe=[[bfg9000, '--regenerate', '.']]
+        recipe=[regenerate + ['.']]
     )
 
 @rule_handler('Compile')
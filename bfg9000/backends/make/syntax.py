@@ -7,6 +7,7 @@ from ... import path
 from ... import safe_str
 from ... import shell
 from ... import iterutils
+from ...memoize import bounded_memoize
 
 Path = path.Path
 
@@ -17,60 +18,77 @@ Include = namedtuple('Include', ['name', 'optional'])
 Syntax = Enum('Syntax', ['target', 'dependency', 'function', 'shell', 'clean'])
 Section = Enum('Section', ['path', 'command', 'flags', 'other'])
 
+def _escape_repl(match):
+    return match.group(1) * 2 + '\\' + match.group(2)
+
+def _regex_escaper(chars):
+    regex = re.compile(r'(\\*)([' + chars + '])')
+    return lambda string: regex.sub(_escape_repl, string)
+
+_escapers = {
+    Syntax.target:     _regex_escaper(r'#?*\[\]~\s%'),
+    Syntax.dependency: _regex_escaper(r'#?*\[\]~\s|%'),
+    Syntax.function:   lambda string: string.replace(',', '$,'),
+    Syntax.shell:      lambda string: string,
+    Syntax.clean:      lambda string: string,
+}
+
+_shelly = frozenset([Syntax.function, Syntax.shell])
+
+# Large Makefiles write the same strings (include dirs, flags, directory
+# prefixes, etc) over and over, so remember how we escaped them.
+@bounded_memoize(65536)
+def _escape_string(string, syntax, shell_quote):
+    escaped = False
+    if shell_quote:
+        string, escaped = shell_quote(string)
+    return Writer.escape_str(string, syntax), escaped
+
+def _escape(thing, syntax, shell_quote):
+    thing = safe_str.safe_str(thing)
+    shelly = syntax in _shelly
+
+    if isinstance(thing, safe_str.escaped_str):
+        return thing.string, True
+    elif isinstance(thing, basestring):
+        return _escape_string(thing, syntax, shell_quote if shelly else None)
+    elif isinstance(thing, safe_str.jbos):
+        escaped = False
+        bits = []
+        for i in thing.bits:
+            string, bit_escaped = _escape(i, syntax, shell_quote)
+            bits.append(string)
+            escaped |= bit_escaped
+        return ''.join(bits), escaped
+    elif isinstance(thing, Path):
+        string, escaped = _escape(thing.realize(path_vars, shelly), syntax,
+                                  shell.escape)
+        if shelly and escaped:
+            string = shell.quote_escaped(string)
+        return string, escaped
+    else:
+        raise TypeError(type(thing))
+
 class Writer(object):
     def __init__(self, stream):
         self.stream = stream
 
     @staticmethod
     def escape_str(string, syntax):
-        def repl(match):
-            return match.group(1) * 2 + '\\' + match.group(2)
-
         if '\n' in string:
             raise ValueError('illegal newline')
-        result = string.replace('$', '$$')
-
-        if syntax == Syntax.target:
-            return re.sub(r'(\\*)([#?*\[\]~\s%])', repl, result)
-        elif syntax == Syntax.dependency:
-            return re.sub(r'(\\*)([#?*\[\]~\s|%])', repl, result)
-        elif syntax == Syntax.function:
-            return re.sub(',', '$,', result)
-        elif syntax in [Syntax.shell, Syntax.clean]:
-            return result
-        else:
+        try:
+            escaper = _escapers[syntax]
+        except KeyError:
             raise ValueError("unknown syntax '{}'".format(syntax))
+        return escaper(string.replace('$', '$$'))
 
     def write_literal(self, string):
         self.stream.write(string)
 
     def write(self, thing, syntax, shell_quote=shell.quote_info):
-        thing = safe_str.safe_str(thing)
-        shelly = syntax in [Syntax.function, Syntax.shell]
-        escaped = False
-
-        if isinstance(thing, safe_str.escaped_str):
-            self.write_literal(thing.string)
-            escaped = True
-        elif isinstance(thing, basestring):
-            if shelly and shell_quote:
-                thing, escaped = shell_quote(thing)
-            self.write_literal(self.escape_str(thing, syntax))
-        elif isinstance(thing, safe_str.jbos):
-            for i in thing.bits:
-                escaped |= self.write(i, syntax, shell_quote)
-        elif isinstance(thing, Path):
-            out = Writer(StringIO())
-            thing = thing.realize(path_vars, shelly)
-            escaped = out.write(thing, syntax, shell.escape)
-
-            thing = out.stream.getvalue()
-            if shelly and escaped:
-                thing = shell.quote_escaped(thing)
-            self.write_literal(thing)
-        else:
-            raise TypeError(type(thing))
-
+        string, escaped = _escape(thing, syntax, shell_quote)
+        self.write_literal(string)
         return escaped
 
     def write_each(self, things, syntax, delim=safe_str.escaped_str(' '),
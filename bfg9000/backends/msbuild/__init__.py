@@ -1,13 +1,21 @@
 import re
-import subprocess
 
 from ...platforms import which
+from ...probe_cache import check_output, prefetch
 
-try:
-    msbuild = which('msbuild')
-    output = subprocess.check_output([msbuild, '/version'])
+def _version_args():
+    return [which('msbuild'), '/version']
+
+def start_probes():
+    try:
+        prefetch(_version_args())
+    except IOError:
+        pass
+
+def get_version():
+    try:
+        output = check_output(_version_args())
+    except IOError:
+        return None
     m = re.search(r'([\d\.]+)$', output)
-    if m:
-        version = m.group(1)
-except IOError:
-    version = None
+    return m.group(1) if m else None
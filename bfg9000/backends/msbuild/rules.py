@@ -1,11 +1,12 @@
 import os
 from itertools import chain
 
-from . import version
+from . import get_version
 from .syntax import *
 from ... import iterutils
 from ...makedirs import makedirs
 
+version = get_version()
 priority = 1 if version is not None else 0
 
 def link_mode(mode):
@@ -1,11 +1,19 @@
 from packaging.version import Version
-import subprocess
 
 from ...platforms import which
+from ...probe_cache import check_output, prefetch
 
-try:
-    ninja = which(['ninja', 'ninja-build'])
-    output = subprocess.check_output([ninja, '--version'])
-    version = Version(output.strip())
-except IOError:
-    version = None
+def _version_args():
+    return [which(['ninja', 'ninja-build']), '--version']
+
+def start_probes():
+    try:
+        prefetch(_version_args())
+    except IOError:
+        pass
+
+def get_version():
+    try:
+        return Version(check_output(_version_args()).strip())
+    except IOError:
+        return None
@@ -1,14 +1,16 @@
 from cStringIO import StringIO
 from itertools import chain, ifilter
-from packaging.specifiers import SpecifierSet
 
-from . import version
+from . import get_version
+from .. import output_file
 from .syntax import *
 from ... import path
 from ... import safe_str
 from ... import shell
 from ... import iterutils
 from ...builtins import find
+from ...memory import tracker
+from ...timings import timer
 
 Path = path.Path
 
@@ -19,6 +21,7 @@ def rule_handler(rule_name):
         return fn
     return decorator
 
+version = get_version()
 priority = 3 if version is not None else 0
 
 def write(env, build_inputs):
@@ -29,17 +32,24 @@ def write(env, build_inputs):
 
     all_rule(build_inputs.get_default_targets(), buildfile)
     for e in build_inputs.edges:
-        _rule_handlers[type(e).__name__](e, build_inputs, buildfile)
+        name = type(e).__name__
+        with timer.timed('rules', name):
+            _rule_handlers[name](e, build_inputs, buildfile)
     install_rule(build_inputs.install_targets, buildfile, env)
     test_rule(build_inputs.tests, buildfile, env)
-    regenerate_rule(build_inputs.find_dirs, buildfile, env)
+    regenerate_rule(build_inputs, buildfile, env)
 
-    with open(env.builddir.append('build.ninja').string(), 'w') as out:
+    tracker.snapshot('generate')
+    with timer.timed('phases', 'write'), \
+         output_file(env.builddir.append('build.ninja').string()) as out:
         buildfile.write(out)
+        timer.count('bytes_written', 'build.ninja', out.tell())
 
 def command_build(buildfile, output, inputs=None, implicit=None,
                   order_only=None, commands=None, env=None):
     # XXX: Only make some command builds use the console pool?
+    # packaging.specifiers is slow to import, so wait until we need it.
+    from packaging.specifiers import SpecifierSet
     extra_kwargs = {}
     if version in SpecifierSet('>=1.5'):
         extra_kwargs['pool'] = 'console'
@@ -170,26 +180,35 @@ def test_rule(tests, buildfile, env):
         commands=commands,
     )
 
-def regenerate_rule(find_dirs, buildfile, env):
+def regenerate_rule(build_inputs, buildfile, env):
     bfg9000 = cmd_var(env.tool('bfg9000'), buildfile)
     bfgpath = Path('build.bfg', path.Root.srcdir)
+    extra_deps = [Path(i, path.Root.srcdir) for i in build_inputs.bfg_files]
+    regenerate = [bfg9000, '--regenerate']
     depfile = None
 
-    if find_dirs:
+    if build_inputs.find_dirs:
         find.write_depfile(env.builddir.append(find.depfile_name).string(),
-                           'build.ninja', find_dirs)
+                           'build.ninja', build_inputs.find_dirs)
+        find.write_queryfile(
+            env.builddir.append(find.queryfile_name).string(), 'build.ninja',
+            [env.srcdir.append(i).string() for i in
+             ['build.bfg'] + build_inputs.bfg_files],
+            build_inputs.find_queries, build_inputs.find_dirs
+        )
         depfile = find.depfile_name
+        regenerate.append('--only-if-changed')
 
     buildfile.rule(
         name='regenerate',
-        command=[bfg9000, '--regenerate', Path('.')],
+        command=regenerate + [Path('.')],
         generator=True,
         depfile=depfile,
     )
     buildfile.build(
         output=Path('build.ninja'),
         rule='regenerate',
-        implicit=[bfgpath]
+        implicit=[bfgpath] + extra_deps
     )
 
 @rule_handler('Compile')
@@ -9,6 +9,7 @@ from ... import path
 from ... import safe_str
 from ... import shell
 from ... import iterutils
+from ...memoize import bounded_memoize
 from ...platforms import platform_name
 
 Path = path.Path
@@ -21,6 +22,50 @@ Build = namedtuple('Build', ['outputs', 'rule', 'inputs', 'implicit',
 Syntax = Enum('Syntax', ['output', 'input', 'shell', 'clean'])
 Section = Enum('Section', ['path', 'command', 'flags', 'other'])
 
+_output_ex = re.compile(r'([:$ ])')
+_input_ex = re.compile(r'([$ ])')
+
+_escapers = {
+    Syntax.output: lambda string: _output_ex.sub(r'$\1', string),
+    Syntax.input:  lambda string: _input_ex.sub(r'$\1', string),
+    Syntax.shell:  lambda string: string.replace('$', '$$'),
+    Syntax.clean:  lambda string: string.replace('$', '$$'),
+}
+
+# The same strings (flags, paths to common directories, etc) get written over
+# and over, so remember how we escaped them.
+@bounded_memoize(65536)
+def _escape_string(string, syntax, shell_quote):
+    escaped = False
+    if shell_quote:
+        string, escaped = shell_quote(string)
+    return Writer.escape_str(string, syntax), escaped
+
+def _escape(thing, syntax, shell_quote):
+    thing = safe_str.safe_str(thing)
+    shelly = syntax == Syntax.shell
+
+    if isinstance(thing, safe_str.escaped_str):
+        return thing.string, True
+    elif isinstance(thing, basestring):
+        return _escape_string(thing, syntax, shell_quote if shelly else None)
+    elif isinstance(thing, safe_str.jbos):
+        escaped = False
+        bits = []
+        for i in thing.bits:
+            string, bit_escaped = _escape(i, syntax, shell_quote)
+            bits.append(string)
+            escaped |= bit_escaped
+        return ''.join(bits), escaped
+    elif isinstance(thing, Path):
+        string, escaped = _escape(thing.realize(path_vars, shelly), syntax,
+                                  shell.escape)
+        if shelly and escaped:
+            string = shell.quote_escaped(string)
+        return string, escaped
+    else:
+        raise TypeError(type(thing))
+
 class Writer(object):
     def __init__(self, stream):
         self.stream = stream
@@ -29,46 +74,18 @@ class Writer(object):
     def escape_str(string, syntax):
         if '\n' in string:
             raise ValueError('illegal newline')
-
-        if syntax == Syntax.output:
-            return re.sub(r'([:$ ])', r'$\1', string)
-        elif syntax == Syntax.input:
-            return re.sub(r'([$ ])', r'$\1', string)
-        elif syntax in [Syntax.shell, Syntax.clean]:
-            return string.replace('$', '$$')
-        else:
+        try:
+            escaper = _escapers[syntax]
+        except KeyError:
             raise ValueError("unknown syntax '{}'".format(syntax))
+        return escaper(string)
 
     def write_literal(self, string):
         self.stream.write(string)
 
     def write(self, thing, syntax, shell_quote=shell.quote_info):
-        thing = safe_str.safe_str(thing)
-        shelly = syntax == Syntax.shell
-        escaped = False
-
-        if isinstance(thing, safe_str.escaped_str):
-            self.write_literal(thing.string)
-            escaped = True
-        elif isinstance(thing, basestring):
-            if shelly and shell_quote:
-                thing, escaped = shell_quote(thing)
-            self.write_literal(self.escape_str(thing, syntax))
-        elif isinstance(thing, safe_str.jbos):
-            for i in thing.bits:
-                escaped |= self.write(i, syntax, shell_quote)
-        elif isinstance(thing, Path):
-            out = Writer(StringIO())
-            thing = thing.realize(path_vars, shelly)
-            escaped = out.write(thing, syntax, shell.escape)
-
-            thing = out.stream.getvalue()
-            if shelly and escaped:
-                thing = shell.quote_escaped(thing)
-            self.write_literal(thing)
-        else:
-            raise TypeError(type(thing))
-
+        string, escaped = _escape(thing, syntax, shell_quote)
+        self.write_literal(string)
         return escaped
 
     def write_each(self, things, syntax, delim=safe_str.escaped_str(' '),
@@ -118,16 +135,21 @@ class Commands(object):
     def __init__(self, commands, env=None):
         self.commands = iterutils.listify(commands)
         self.env = env or {}
+        self._rendered = None
 
     def use(self):
-        out = Writer(StringIO())
-        if self.__needs_shell and platform_name() == 'windows':
-            out.write_literal('cmd /c ')
+        # We need the rendered command both to find builds that share it and
+        # to write it out, so only render it once.
+        if self._rendered is None:
+            out = Writer(StringIO())
+            if self.__needs_shell and platform_name() == 'windows':
+                out.write_literal('cmd /c ')
 
-        env_vars = shell.global_env(self.env)
-        for line in shell.join_commands(chain(env_vars, self.commands)):
-            out.write_shell(line)
-        return safe_str.escaped_str(out.stream.getvalue())
+            env_vars = shell.global_env(self.env)
+            for line in shell.join_commands(chain(env_vars, self.commands)):
+                out.write_shell(line)
+            self._rendered = safe_str.escaped_str(out.stream.getvalue())
+        return self._rendered
 
     def _safe_str(self):
         return self.use()
@@ -236,7 +258,29 @@ class NinjaFile(object):
         if rule.restat:
             self._write_variable(out, var('restat'), '1', indent=1)
 
-    def _write_build(self, out, build):
+    def _shared_commands(self):
+        # Builds often run exactly the same commands (e.g. a script that
+        # generates several files at once), so write each command that's used
+        # more than once as a top-level variable and refer to that instead.
+        counts = OrderedDict()
+        for build in self._builds:
+            for value in build.variables.itervalues():
+                if isinstance(value, Commands):
+                    string = value.use().string
+                    counts[string] = counts.get(string, 0) + 1
+
+        shared = OrderedDict()
+        index = 0
+        for string, count in counts.iteritems():
+            if count > 1:
+                name = None
+                while name is None or self.has_variable(name):
+                    index += 1
+                    name = var('cmd_{}'.format(index))
+                shared[string] = name
+        return shared
+
+    def _write_build(self, out, build, shared_commands):
         out.write_literal('build ')
         out.write_each(build.outputs, Syntax.output)
         out.write_literal(': ' + build.rule)
@@ -249,6 +293,8 @@ class NinjaFile(object):
 
         if build.variables:
             for k, v in build.variables.iteritems():
+                if isinstance(v, Commands):
+                    v = shared_commands.get(v.use().string, v)
                 self._write_variable(out, k, v, indent=1)
 
     def write(self, out):
@@ -269,12 +315,18 @@ class NinjaFile(object):
             if self._variables[section]:
                 out.write_literal('\n')
 
+        shared_commands = self._shared_commands()
+        for value, name in shared_commands.iteritems():
+            self._write_variable(out, name, safe_str.escaped_str(value))
+        if shared_commands:
+            out.write_literal('\n')
+
         for name, rule in self._rules.iteritems():
             self._write_rule(out, name, rule)
             out.write_literal('\n')
 
         for build in self._builds:
-            self._write_build(out, build)
+            self._write_build(out, build, shared_commands)
 
         if self._defaults:
             out.write_literal('\ndefault ')
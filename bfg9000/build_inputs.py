@@ -1,6 +1,10 @@
+import cPickle as pickle
+import os
+
 from . import path
 from .iterutils import iterate, listify
 from .safe_str import safe_str
+from .version import version as bfg_version
 
 class Node(object):
     def __init__(self):
@@ -76,7 +80,13 @@ class TestInputs(object):
     def __nonzero__(self):
         return bool(self.tests)
 
+class SnapshotVersionError(RuntimeError):
+    pass
+
 class BuildInputs(object):
+    version = 2
+    snapshot = '.bfg_build'
+
     def __init__(self):
         self.edges = []
         self.default_targets = []
@@ -86,10 +96,35 @@ class BuildInputs(object):
         self.global_options = {}
         self.global_link_options = []
         self.find_dirs = set()
+        self.find_queries = []
+        self.bfg_files = []
+        self.exports = {}
 
     def add_edge(self, edge):
         self.edges.append(edge)
 
+    def merge(self, other):
+        self.edges.extend(other.edges)
+        self.default_targets.extend(other.default_targets)
+        if other.fallback_default:
+            self.fallback_default = other.fallback_default
+
+        self.install_targets.files.extend(other.install_targets.files)
+        self.install_targets.directories.extend(
+            other.install_targets.directories
+        )
+        self.tests.tests.extend(other.tests.tests)
+        self.tests.targets.extend(other.tests.targets)
+        self.tests.extra_deps.extend(other.tests.extra_deps)
+
+        for k, v in other.global_options.iteritems():
+            self.global_options.setdefault(k, []).extend(v)
+        self.global_link_options.extend(other.global_link_options)
+
+        self.find_dirs.update(other.find_dirs)
+        self.find_queries.extend(other.find_queries)
+        self.bfg_files.extend(other.bfg_files)
+
     def get_default_targets(self):
         if self.default_targets:
             return self.default_targets
@@ -97,3 +132,23 @@ class BuildInputs(object):
             return [self.fallback_default]
         else:
             return []
+
+    def save(self, path):
+        with open(os.path.join(path, self.snapshot), 'wb') as out:
+            pickle.dump({
+                'version': self.version,
+                'bfg_version': bfg_version,
+                'data': self,
+            }, out, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, cls.snapshot), 'rb') as inp:
+            state = pickle.load(inp)
+        # The snapshot holds pickled objects, so it's only usable by the exact
+        # version of bfg9000 that created it.
+        if ( state['version'] != cls.version or
+             state['bfg_version'] != bfg_version ):
+            raise SnapshotVersionError('snapshot was created by a different ' +
+                                       'version of bfg9000')
+        return state['data']
@@ -2,9 +2,12 @@ import functools
 import importlib
 import os
 import pkgutil
+import re
+
+from ..registry import scan_registrations
+from ..timings import timer
 
 _all_builtins = {}
-_loaded_builtins = False
 
 class Binder(object):
     def __init__(self, args, fn):
@@ -25,21 +28,55 @@ def _decorate_builtin(*args):
 builtin = _decorate_builtin()
 builtin.globals = _decorate_builtin
 
-def _load_builtins():
-    global _loaded_builtins
-    if not _loaded_builtins:
-        # Lazily load the builtins so we don't get cyclic imports.
-        # XXX: There's probably a better way to do this.
-        for _, name, _ in pkgutil.walk_packages(__path__, '.'):
-            importlib.import_module(name, __package__)
-        _loaded_builtins = True
+# The modules defining each of our builtins, found by looking for the
+# decorator in their source. This lets us import a module the first time one
+# of its builtins is called instead of importing every module in this package
+# up front. The driver changes directories before running build.bfg, so make
+# sure we can still find them.
+__path__ = [os.path.abspath(i) for i in __path__]
+_builtin_pattern = re.compile(r'^@builtin\b.*\n(?:@.*\n)*def\s+(\w+)', re.M)
+_builtin_modules = None
 
-def bind(**kwargs):
-    _load_builtins()
+def _get_builtin_modules():
+    global _builtin_modules
+    if _builtin_modules is None:
+        _builtin_modules = scan_registrations(__path__[0],
+                                              _builtin_pattern)
+        if not _builtin_modules:
+            # We couldn't read our source, so just load everything.
+            for _, name, _ in pkgutil.walk_packages(__path__, '.'):
+                importlib.import_module(name, __package__)
+    return _builtin_modules
+
+def _load_builtin(name):
+    # Import this when it's called so we don't get cyclic imports.
+    if name not in _all_builtins:
+        importlib.import_module('.' + _get_builtin_modules()[name],
+                                __package__)
+
+def _bind_lazily(name, kwargs):
+    bound = []
 
+    def wrapper(*args, **kw):
+        if not bound:
+            _load_builtin(name)
+            bound.append(_all_builtins[name].bind(**kwargs))
+        return bound[0](*args, **kw)
+    wrapper.__name__ = name
+    return wrapper
+
+def bind(**kwargs):
     builtins = {}
-    for k, v in _all_builtins.iteritems():
-        builtins[k] = v.bind(builtins=builtins, **kwargs)
+    kwargs['builtins'] = builtins
+    for k in set(_get_builtin_modules()).union(_all_builtins):
+        if k in _all_builtins:
+            fn = _all_builtins[k].bind(**kwargs)
+        else:
+            fn = _bind_lazily(k, kwargs)
+        builtins[k] = timer.wrap('builtins', k, fn)
+        # Let other builtins recognize this one when it's passed to them
+        # (e.g. `find_files(filter=filter_by_platform)`).
+        builtins[k].builtin_name = k
 
     # XXX: Make this more generic?
     builtins['env'] = kwargs['env']
@@ -1,11 +1,19 @@
+import cPickle as pickle
 import fnmatch
 import os
 import posixpath
 import re
+import struct
+import threading
+import time
+from collections import defaultdict
 
 from . import builtin
 from ..iterutils import iterate
 from ..backends.make.syntax import Writer, Syntax
+from ..environment import Environment
+from ..fs_cache import cache as fs
+from ..probe_cache import file_signature
 
 depfile_name = '.bfg_find_deps'
 def write_depfile(path, output, seen_dirs, makeify=False):
@@ -22,82 +30,711 @@ def write_depfile(path, output, seen_dirs, makeify=False):
                 out.write(os.path.abspath(i), Syntax.target)
                 out.write_literal(':\n')
 
-def _listdir(path):
-    dirs, nondirs = [], []
+queryfile_name = '.bfg_find_queries'
+def write_queryfile(path, output, bfgfiles, queries, seen_dirs):
+    # This is pickled rather than saved as JSON so that the queries are
+    # replayed with exactly the (byte) strings they were made with.
+    with open(path, 'wb') as f:
+        pickle.dump({
+            'version': 5,
+            'output': output,
+            'bfgfiles': [[i, file_signature(i)] for i in bfgfiles],
+            'queries': queries,
+            'seen_dirs': seen_dirs,
+        }, f, pickle.HIGHEST_PROTOCOL)
+
+def check_queryfile(path, env):
+    # Re-run the recorded queries and, if none of their results (or the
+    # directories they searched) changed, return the name of the build file
+    # they were recorded for. Otherwise, return None to indicate that the
+    # build.bfg file needs to be re-executed.
     try:
-        names = os.listdir(path)
-        for name in names:
-            if os.path.isdir(os.path.join(path, name)):
-                dirs.append(name)
-            else:
-                nondirs.append(name)
-    except:
-        pass
-    return dirs, nondirs
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+    except Exception:
+        return None
+
+    if state['version'] != 5:
+        return None
+    for bfgfile, signature in state['bfgfiles']:
+        if file_signature(bfgfile) != signature:
+            return None
+
+    if check_queries(state['queries'], env) != state['seen_dirs']:
+        return None
+    return state['output']
+
+def check_queries(queries, env):
+    # Replay the queries, returning the set of directories they searched, or
+    # None if any of their results changed. Callers should compare the
+    # directories to the ones they recorded, since a new directory (even an
+    # empty one) needs to be watched for changes too.
+    seen_dirs = set()
+    for q in queries:
+        if q['filter'] == 'platform':
+            filter = _platform_filter(env.platform)
+        elif q['filter'] is None:
+            filter = None
+        else:
+            return None
+        results, dirs = _find_files(q['path'], q['name'], q['type'],
+                                    q['flat'], filter, exclude=q['exclude'],
+                                    ignore_file=q['ignore_file'],
+                                    engine=q['engine'])
+        if results != q['results']:
+            return None
+        seen_dirs.update(dirs)
+    return seen_dirs
+
+dircache_name = '.bfg_find_cache'
+class DirCache(object):
+    version = 1
+    # Directories modified this recently might still be changing within the
+    # resolution of their mtime, so we don't trust a listing of them.
+    settle_time = 2
+
+    def __init__(self):
+        self.path = None
+        self._set_entries({})
+        self._used = {}
+
+    def attach(self, path):
+        self.path = path
+        self._set_entries({})
+        self._used = {}
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if state['version'] == self.version:
+                self._set_entries(state['dirs'])
+        except Exception:
+            pass
+
+    def _set_entries(self, entries):
+        # Count the directories under each of their ancestors once, so that
+        # count() doesn't have to look through every entry on each call.
+        self._entries = entries
+        self._counts = defaultdict(int)
+        for path in entries:
+            while True:
+                self._counts[path] += 1
+                parent = posixpath.dirname(path)
+                if not parent or parent == path:
+                    break
+                path = parent
+
+    def listdir(self, path):
+        st = fs.stat(path) if self.path else None
+        if st is None:
+            return fs.listdir(path)
 
-def _walk_flat(top):
-    yield (top,) + _listdir(top)
+        mtime = st.st_mtime
+        entry = self._used.get(path) or self._entries.get(path)
+        if entry is None or entry[0] != mtime:
+            dirs, nondirs, links = fs.listdir(path)
+            entry = [mtime, dirs, nondirs, sorted(links)]
+            if time.time() - mtime < self.settle_time:
+                return dirs, nondirs, links
 
-def _walk_recursive(top):
-    dirs, nondirs = _listdir(top)
+        self._used[path] = entry
+        # The walker filters these lists in place, so hand out copies.
+        return list(entry[1]), list(entry[2]), set(entry[3])
+
+    def contains(self, path, name):
+        # If we have an up-to-date listing of `path`, look for `name` in that
+        # instead of stat'ing it. The walk stats `path` anyway when listing it,
+        # so this costs nothing extra.
+        st = fs.stat(path) if self.path else None
+        if st is not None:
+            entry = self._used.get(path) or self._entries.get(path)
+            if entry is not None and entry[0] == st.st_mtime:
+                return name in entry[2]
+        return fs.stat(posixpath.join(path, name)) is not None
+
+    def count(self, top):
+        # Return the number of directories under `top` we saw last time.
+        return self._counts.get(top.rstrip('/') or top, 0)
+
+    def save(self):
+        # Only keep the directories we looked at this time, so that the cache
+        # doesn't grow forever as the source tree changes.
+        if not self.path or self._used == self._entries:
+            return
+        with open(self.path, 'wb') as f:
+            pickle.dump({
+                'version': self.version,
+                'dirs': self._used,
+            }, f, pickle.HIGHEST_PROTOCOL)
+        self._set_entries(self._used)
+        self._used = {}
+
+dircache = DirCache()
+
+def _walk_flat(top, lister):
+    dirs, nondirs, _ = lister(top)
+    yield top, dirs, nondirs
+
+def _walk_recursive(top, lister):
+    dirs, nondirs, links = lister(top)
     yield top, dirs, nondirs
     for name in dirs:
-        path = posixpath.join(top, name)
-        if not os.path.islink(path):
-            for i in _walk_recursive(path):
+        if name not in links:
+            for i in _walk_recursive(posixpath.join(top, name), lister):
                 yield i
 
-def _find_files(paths, name, type, flat, filter):
-    results = []
-    seen_dirs = []
+class _Prefetcher(object):
+    # List directories on a thread pool, staying `lookahead` levels ahead of
+    # the directories our caller has actually entered. This keeps the pool
+    # busy without wasting much effort on subtrees the caller filters out.
+    def __init__(self, pool, lister, lookahead=2):
+        self.pool = pool
+        self.lister = lister
+        self.lookahead = lookahead
+        self._lock = threading.Lock()
+        self._results = {}
+        self._ahead = {}
+        self._done = set()
+
+    def _list(self, path):
+        listing = self.lister(path)
+        with self._lock:
+            self._done.add(path)
+            ahead = self._ahead[path]
+        self._request_children(path, listing, ahead)
+        return listing
+
+    def _request_children(self, path, listing, ahead):
+        if ahead > 0:
+            dirs, _, links = listing
+            for i in dirs:
+                if i not in links:
+                    self.request(posixpath.join(path, i), ahead - 1)
 
+    def request(self, path, ahead):
+        with self._lock:
+            if path not in self._results:
+                self._ahead[path] = ahead
+                self._results[path] = self.pool.apply_async(self._list,
+                                                            (path,))
+                return self._results[path]
+            if ahead <= self._ahead[path]:
+                return self._results[path]
+            self._ahead[path] = ahead
+            finished = path in self._done
+
+        # The listing already finished with a smaller budget, so request its
+        # children ourselves.
+        if finished:
+            self._request_children(path, self._results[path].get(), ahead)
+        return self._results[path]
+
+    def get(self, path):
+        return self.request(path, self.lookahead).get()
+
+def _walk_parallel(top, pool, lister):
+    prefetcher = _Prefetcher(pool, lister)
+
+    def walk(top):
+        dirs, nondirs, links = prefetcher.get(top)
+        yield top, dirs, nondirs
+        # Descend in the same order as _walk_recursive. Any directories our
+        # caller filtered out are never walked (though they may be listed).
+        for name in dirs:
+            if name not in links:
+                for i in walk(posixpath.join(top, name)):
+                    yield i
+
+    return walk(top)
+
+# Trees with at least this many directories last time are walked in parallel
+# unless the caller says otherwise.
+parallel_threshold = 256
+parallel_jobs = 8
+
+def _walker(top, flat, jobs, lister):
     # "Does the walker choose the path, or the path the walker?" - Garth Nix
-    walker = _walk_flat if flat else _walk_recursive
+    if flat:
+        return _walk_flat(top, lister), None
+
+    if jobs is None:
+        # There's no point in listing the git index in parallel, since it's
+        # already in memory.
+        jobs = (parallel_jobs if not lister.index and
+                dircache.count(top) >= parallel_threshold else 1)
+    if jobs > 1:
+        # Only import this if we need it; most searches are small.
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(jobs)
+        return _walk_parallel(top, pool, lister), pool
+    return _walk_recursive(top, lister), None
+
+def _translate_glob(pattern):
+    # Like fnmatch.translate, except that wildcards don't match across
+    # directories, and "**" matches any number of them (including zero).
+    result = ''
+    parts = pattern.split('/')
+    for n, part in enumerate(parts):
+        last = n == len(parts) - 1
+        if part == '**':
+            result += '.*' if last else '(?:.*/)?'
+            continue
+
+        i = 0
+        while i < len(part):
+            c = part[i]
+            i += 1
+            if c == '*':
+                result += '[^/]*'
+            elif c == '?':
+                result += '[^/]'
+            elif c == '[':
+                j = i
+                if j < len(part) and part[j] == '!':
+                    j += 1
+                if j < len(part) and part[j] == ']':
+                    j += 1
+                while j < len(part) and part[j] != ']':
+                    j += 1
+                if j >= len(part):
+                    result += '\\['
+                else:
+                    stuff = part[i:j].replace('\\', '\\\\')
+                    i = j + 1
+                    if stuff[0] == '!':
+                        stuff = '^' + stuff[1:]
+                    elif stuff[0] == '^':
+                        stuff = '\\' + stuff
+                    result += '[' + stuff + ']'
+            else:
+                result += re.escape(c)
+        if not last:
+            result += '/'
+    return result
+
+class _Matcher(object):
+    # Compile all the patterns passed to find_files into (at most) two
+    # regexes: one for the patterns that match a file's name, and one for the
+    # patterns with a "/" in them, which match its path relative to the
+    # directory being searched.
+    def __init__(self, patterns):
+        names, paths = [], []
+        for i in iterate(patterns):
+            i = os.path.normcase(i).replace(os.sep, '/')
+            if '/' in i:
+                paths.append(_translate_glob(i))
+            else:
+                names.append(fnmatch.translate(i))
+
+        self._name = self._compile(names)
+        self._path = self._compile(paths, r'\Z')
+        self._normcase = os.path.normcase('A') != 'A'
+
+    @staticmethod
+    def _compile(patterns, suffix=''):
+        if not patterns:
+            return None
+        return re.compile('|'.join('(?:{})'.format(i + suffix)
+                                   for i in patterns), re.S).match
+
+    def match_root(self, path):
+        if self._normcase:
+            path = os.path.normcase(path)
+        return bool(self._name and self._name(path))
+
+    def filter(self, reldir, names):
+        name_match, path_match = self._name, self._path
+        if self._normcase:
+            names = [(os.path.normcase(i), i) for i in names]
+        else:
+            names = [(i, i) for i in names]
+
+        if path_match is None:
+            if name_match is None:
+                return []
+            return [orig for i, orig in names if name_match(i)]
+
+        prefix = reldir + '/' if reldir else ''
+        return [orig for i, orig in names if
+                (name_match and name_match(i)) or path_match(prefix + i)]
 
-    def _filter_in_place(files, type, func):
-        for i in reversed(range( len(files) )):
-            if not func(files[i], type):
-                files.pop(i)
+def _read_varint(data, pos):
+    # This is git's "offset" encoding, not a plain base-128 varint.
+    c = ord(data[pos])
+    pos += 1
+    value = c & 0x7f
+    while c & 0x80:
+        c = ord(data[pos])
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7f)
+    return value, pos
 
-    def _filter_join(base, files, name):
-        return (posixpath.join(base, i) for i in fnmatch.filter(files, name))
+_S_IFMT = 0o170000
+_S_IFDIR = 0o040000
+_S_IFLNK = 0o120000
+_S_IFGITLINK = 0o160000
+
+def _read_git_index_entries(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:4] != 'DIRC':
+        raise ValueError('not a git index')
+    version, count = struct.unpack('>LL', data[4:12])
+    if version not in (2, 3, 4):
+        raise ValueError('unsupported git index version {}'.format(version))
+
+    unpack_long = struct.Struct('>L').unpack_from
+    unpack_short = struct.Struct('>H').unpack_from
+    find = data.index
+
+    pos = 12
+    prev = ''
+    for _ in xrange(count):
+        start = pos
+        mode, = unpack_long(data, pos + 24)
+        flags, = unpack_short(data, pos + 60)
+        pos += 62
+        skip = False
+        if version >= 3 and flags & 0x4000:
+            extended, = unpack_short(data, pos)
+            pos += 2
+            # Skip-worktree entries (e.g. from a sparse checkout) aren't on
+            # disk.
+            skip = extended & 0x4000
+
+        if version == 4:
+            strip, pos = _read_varint(data, pos)
+            end = find('\0', pos)
+            name = prev[:len(prev) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = find('\0', pos)
+            name = data[pos:end]
+            # Entries are padded with 1-8 NULs to a multiple of 8 bytes.
+            pos = start + ((end - start + 8) & ~7)
+        prev = name
+
+        if not skip:
+            yield name, mode
+
+class _GitIndex(object):
+    def __init__(self, path, worktree):
+        self.path = path
+        self._tree = {'': ([], [], set())}
+
+        def add_dir(name):
+            parent = posixpath.dirname(name)
+            if parent not in self._tree:
+                add_dir(parent)
+            self._tree[parent][0].append(posixpath.basename(name))
+            self._tree[name] = ([], [], set())
+
+        for name, mode in _read_git_index_entries(path):
+            kind = mode & _S_IFMT
+            dirname, _, basename = name.rpartition('/')
+            if dirname not in self._tree:
+                add_dir(dirname)
+
+            if kind == _S_IFDIR or kind == _S_IFGITLINK:
+                # A submodule or sparse directory. We don't know what's in
+                # it, so its contents will be listed from disk.
+                self._tree[dirname][0].append(basename)
+                continue
+
+            files = self._tree[dirname][1]
+            # Unmerged paths have an entry for each stage.
+            if files and files[-1] == basename:
+                continue
+            if ( kind == _S_IFLNK and
+                 os.path.isdir(os.path.join(worktree, name)) ):
+                self._tree[dirname][0].append(basename)
+                self._tree[dirname][2].add(basename)
+            else:
+                files.append(basename)
+
+    def listdir(self, path):
+        if path not in self._tree:
+            return None
+        dirs, nondirs, links = self._tree[path]
+        return list(dirs), list(nondirs), set(links)
+
+def _find_git_dir(path):
+    path = os.path.abspath(path)
+    while True:
+        git = os.path.join(path, '.git')
+        if os.path.isdir(git):
+            return path, git
+        elif os.path.isfile(git):
+            # A linked worktree or submodule points to its real git dir.
+            with open(git) as f:
+                line = f.readline().strip()
+            if line.startswith('gitdir:'):
+                return path, os.path.join(path, line[len('gitdir:'):].strip())
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None, None
+        path = parent
+
+_git_indexes = {}
+def _open_git_index(top):
+    worktree, gitdir = _find_git_dir(top)
+    if not worktree:
+        return None, None
+
+    path = os.path.join(gitdir, 'index')
+    signature = file_signature(path)
+    if signature is None:
+        return None, None
+    if path not in _git_indexes or _git_indexes[path][0] != signature:
+        try:
+            _git_indexes[path] = (signature, _GitIndex(path, worktree))
+        except (IOError, ValueError, struct.error):
+            return None, None
+
+    prefix = os.path.relpath(os.path.abspath(top), worktree)
+    prefix = '' if prefix == '.' else prefix.replace(os.sep, '/')
+    return _git_indexes[path][1], prefix
+
+# Directories that never have anything we'd want to build from.
+default_exclude = ['.git', '.hg', '.svn', '.bzr', '_darcs', 'CVS']
+
+def _read_ignore_file(path, base):
+    rules = []
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except IOError:
+        return rules
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+
+        # Like .gitignore, a pattern with a "/" in it is relative to the
+        # directory holding the ignore file; otherwise, it can match at any
+        # depth below it.
+        if '/' in line:
+            match = re.compile(_translate_glob(line.lstrip('/')) + r'\Z',
+                               re.S).match
+            rules.append((base, negate, dir_only, True, match))
+        else:
+            match = re.compile(fnmatch.translate(line)).match
+            rules.append((base, negate, dir_only, False, match))
+    return rules
+
+class _Lister(object):
+    # List the directories in a search, either from the filesystem or from the
+    # git index, and cut whole subtrees out before they're listed: VCS
+    # directories, bfg9000 build directories, anything matching one of the
+    # `exclude` globs, (optionally) anything ignored by an ignore file, and any
+    # directory rejected by `filter`. This runs on the prefetcher's threads
+    # when walking in parallel, so everything is pruned before the prefetcher
+    # can queue it up.
+    def __init__(self, top, exclude, ignore_file, engine, filter=None):
+        self.top = top
+        # `top` might end with a "/" (or several), so work out where the
+        # relative part of a path starts once, here.
+        self._toplen = len(posixpath.join(top, ''))
+        self.ignore_file = ignore_file
+        self.filter = filter
+        self._exclude = _Matcher(exclude) if exclude else None
+        self._rules = {}
+        self._indexed = set()
+
+        # Other files (besides the directories we list from disk) that can
+        # change what we find.
+        self.deps = set()
+
+        self.index = None
+        if engine == 'git':
+            self.index, self._prefix = _open_git_index(top)
+        elif engine != 'walk':
+            raise ValueError('unknown engine {!r}'.format(engine))
+
+    def from_disk(self, path):
+        return path not in self._indexed
+
+    def reldir(self, path):
+        return path[self._toplen:] if path != self.top else ''
+
+    def _ignored(self, rules, relpath, name, is_dir):
+        ignored = False
+        for base, negate, dir_only, anchored, match in rules:
+            if dir_only and not is_dir:
+                continue
+            if anchored:
+                if base:
+                    if not relpath.startswith(base + '/'):
+                        continue
+                    subpath = relpath[len(base) + 1:]
+                else:
+                    subpath = relpath
+                if not match(subpath):
+                    continue
+            elif not match(name):
+                continue
+            ignored = not negate
+        return ignored
+
+    def _listdir(self, path, reldir):
+        if self.index:
+            listing = self.index.listdir(posixpath.join(self._prefix, reldir)
+                                         .rstrip('/'))
+            if listing is not None:
+                self._indexed.add(path)
+                self.deps.add(self.index.path)
+                return listing
+        # This directory isn't tracked (or we're not using the index), so
+        # look on disk.
+        return dircache.listdir(path)
+
+    def __call__(self, path):
+        reldir = self.reldir(path)
+        prefix = reldir + '/' if reldir else ''
+        dirs, nondirs, links = self._listdir(path, reldir)
+
+        rules = []
+        if reldir:
+            rules = self._rules.get(posixpath.dirname(reldir), [])
+        if self.ignore_file and self.ignore_file in nondirs:
+            ignore_path = posixpath.join(path, self.ignore_file)
+            self.deps.add(ignore_path)
+            rules = rules + _read_ignore_file(ignore_path, reldir)
+        if dirs:
+            self._rules[reldir] = rules
+
+        if self._exclude:
+            excluded = set(self._exclude.filter(reldir, dirs + nondirs))
+            dirs[:] = [i for i in dirs if i not in excluded]
+            nondirs[:] = [i for i in nondirs if i not in excluded]
+        if rules:
+            dirs[:] = [i for i in dirs if not
+                       self._ignored(rules, prefix + i, i, True)]
+            nondirs[:] = [i for i in nondirs if not
+                          self._ignored(rules, prefix + i, i, False)]
+        dirs[:] = [i for i in dirs if not (
+            i in default_exclude or
+            dircache.contains(posixpath.join(path, i), Environment.envfile)
+        )]
+        if self.filter:
+            dirs[:] = [i for i in dirs if self.filter(i, 'd')]
+        return dirs, nondirs, links
+
+def _iter_find(paths, name, type, flat, filter, seen_dirs, jobs=None,
+               exclude=None, ignore_file=None, engine='walk'):
+    matcher = _Matcher(name)
 
     for p in iterate(paths):
-        if type != 'f' and fnmatch.fnmatch(p, name):
-            results.append(p)
+        if type != 'f' and matcher.match_root(p):
+            yield p
 
-        generator = walker(p)
-        for path, dirs, files in generator:
-            if filter:
-                _filter_in_place(dirs, 'd', filter)
-                _filter_in_place(files, 'f', filter)
+        # The lister filters out directories itself, so that the walker never
+        # descends into (or prefetches) them.
+        lister = _Lister(p, exclude, ignore_file, engine, filter)
+        walker, pool = _walker(p, flat, jobs, lister)
+        try:
+            for path, dirs, files in walker:
+                if filter:
+                    files[:] = [i for i in files if filter(i, 'f')]
 
-            seen_dirs.append(path)
-            if type != 'f':
-                results.extend(_filter_join(path, dirs, name))
-            if type != 'd':
-                results.extend(_filter_join(path, files, name))
+                # Directories listed from the git index only change when the
+                # index does, so there's no need to watch them.
+                if lister.from_disk(path):
+                    seen_dirs.add(path)
+                reldir = lister.reldir(path)
+                if type != 'f':
+                    for i in matcher.filter(reldir, dirs):
+                        yield posixpath.join(path, i)
+                if type != 'd':
+                    for i in matcher.filter(reldir, files):
+                        yield posixpath.join(path, i)
+        finally:
+            if pool:
+                pool.terminate()
+            seen_dirs.update(lister.deps)
 
+def _find_files(paths, name, type, flat, filter, jobs=None, exclude=None,
+                ignore_file=None, engine='walk'):
+    seen_dirs = set()
+    results = list(_iter_find(paths, name, type, flat, filter, seen_dirs,
+                              jobs, exclude, ignore_file, engine))
     return results, seen_dirs
 
-def find(path='.', name='*', type=None, flat=False):
-    return _find_files(path, name, type, flat, None)[0]
+def find(path='.', name='*', type=None, flat=False, jobs=None, exclude=None,
+         ignore_file=None, engine='walk'):
+    return _find_files(path, name, type, flat, None, jobs, exclude,
+                       ignore_file, engine)[0]
 
 known_platforms = ['posix', 'linux', 'darwin', 'cygwin', 'windows']
 
+_platform_filters = {}
+def _platform_filter(platform):
+    key = (platform.name, platform.kind)
+    if key not in _platform_filters:
+        ex = '|'.join(re.escape(i) for i in known_platforms
+                      if i not in key)
+        search = re.compile(r'(^|_)(' + ex + r')(\.[^\.])?$').search
+        _platform_filters[key] = lambda name, type: search(name) is None
+    return _platform_filters[key]
+
 @builtin.globals('env')
 def filter_by_platform(env, name, type):
-    my_plat = set([env.platform.name, env.platform.kind])
-    ex = '|'.join(re.escape(i) for i in known_platforms if i not in my_plat)
-    return re.search(r'(^|_)(' + ex + r')(\.[^\.])?$', name) is None
+    return _platform_filter(env.platform)(name, type)
 
-@builtin.globals('builtins', 'build_inputs', 'env')
-def find_files(builtins, build_inputs, env, path='.', name='*', type=None,
-               flat=False, filter=filter_by_platform, cache=True):
-    if filter == filter_by_platform:
-        filter = builtins['filter_by_platform']
+def _filter_kind(env, filter):
+    if ( filter is filter_by_platform or
+         getattr(filter, 'builtin_name', None) == 'filter_by_platform' ):
+        return _platform_filter(env.platform), 'platform'
+    else:
+        # We can't replay arbitrary filters when regenerating.
+        return filter, None if filter is None else 'custom'
 
-    results, seen_dirs = _find_files(path, name, type, flat, filter)
+@builtin.globals('build_inputs', 'env')
+def find_files(build_inputs, env, path='.', name='*', type=None, flat=False,
+               filter=filter_by_platform, cache=True, jobs=None, exclude=None,
+               ignore_file=None, engine='walk'):
+    filter, filter_kind = _filter_kind(env, filter)
+
+    results, seen_dirs = _find_files(path, name, type, flat, filter, jobs,
+                                     exclude, ignore_file, engine)
     if cache:
         build_inputs.find_dirs.update(seen_dirs)
+        build_inputs.find_queries.append({
+            'path': path, 'name': name, 'type': type, 'flat': flat,
+            'filter': filter_kind, 'exclude': exclude,
+            'ignore_file': ignore_file, 'engine': engine, 'results': results,
+        })
     return results
+
+@builtin.globals('build_inputs', 'env')
+def iter_files(build_inputs, env, path='.', name='*', type=None, flat=False,
+               filter=filter_by_platform, cache=True, jobs=None, exclude=None,
+               ignore_file=None, engine='walk'):
+    filter, filter_kind = _filter_kind(env, filter)
+    if not cache:
+        return _iter_find(path, name, type, flat, filter, set(), jobs,
+                          exclude, ignore_file, engine)
+
+    # Record the query up front, but mark it as unreplayable until we've
+    # yielded every result. Otherwise, stopping early would leave us with an
+    # incomplete list of results to check against when regenerating.
+    query = {
+        'path': path, 'name': name, 'type': type, 'flat': flat,
+        'filter': 'partial', 'exclude': exclude, 'ignore_file': ignore_file,
+        'engine': engine, 'results': [],
+    }
+    build_inputs.find_queries.append(query)
+
+    def generate():
+        for i in _iter_find(path, name, type, flat, filter,
+                            build_inputs.find_dirs, jobs, exclude,
+                            ignore_file, engine):
+            query['results'].append(i)
+            yield i
+        query['filter'] = filter_kind
+    return generate()
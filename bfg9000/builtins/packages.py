@@ -1,6 +1,7 @@
+import json
 import os.path
 import re
-from packaging.version import Version
+import subprocess
 
 from . import builtin
 from .find import find
@@ -8,36 +9,188 @@ from .version import check_version, make_specifier
 from .. import path
 from ..build_inputs import objectify
 from ..file_types import *
+from ..fs_cache import cache as fs
 from ..iterutils import iterate, listify
 from ..platforms import which
+from ..shell import posix as pshell
+
+class PackageResolutionError(ValueError):
+    pass
 
 class Package(object):
     def __init__(self, includes=None, system_includes=None, libraries=None,
-                 lib_dirs=None):
+                 lib_dirs=None, compile_options=None, link_options=None):
         self.includes = includes or []
         self.system_includes = system_includes or []
         self.libraries = libraries or []
         self.lib_dirs = lib_dirs or []
+        self.compile_options = compile_options or []
+        self.link_options = link_options or []
 
-def _find_library(env, name, search_dirs, static):
+def _find_libraries(env, names, search_dirs, static=False):
     # XXX: Support alternative naming schemes (e.g. libfoo.a vs foo.lib for GCC
     # on Windows)? Also not sure how we'll support other runtimes (e.g. JVM).
-    linkers = [env.linker('c', 'shared_library'),
-               env.linker('c', 'static_library')]
+    modes = ['shared_library', 'static_library']
     if static:
-        linkers = linkers[1:]
-    for d in search_dirs:
-        for i in linkers:
-            candidate = i.output_file(os.path.join(os.path.abspath(d), name))
-            if os.path.exists(candidate.link.path.string()):
-                return candidate
-    raise ValueError("unable to find package '{}'".format(name))
+        modes = modes[1:]
+    search_dirs = [os.path.abspath(i) for i in search_dirs]
+
+    def find():
+        # Look for all the libraries in one pass over the search dirs, so
+        # that each directory's listing is only needed once.
+        result = [None] * len(names)
+        for d in search_dirs:
+            for n, name in enumerate(names):
+                if result[n] is not None:
+                    continue
+                for i in modes:
+                    linker = env.linker('c', i)
+                    candidate = linker.output_file(os.path.join(d, name))
+                    if fs.exists(candidate.link.path.string()):
+                        result[n] = [d, i]
+                        break
+            if None not in result:
+                break
+        return result
+
+    # Libraries only come and go when their directories change, so we can
+    # remember where we found each one until then.
+    result = env.probe('libraries:' + json.dumps([names, search_dirs, static]),
+                       find, ['CC'], search_dirs)
+    for name, found in zip(names, result):
+        if found is None:
+            raise PackageResolutionError("unable to find package '{}'"
+                                         .format(name))
+    return [env.linker('c', mode).output_file(os.path.join(d, name))
+            for name, (d, mode) in zip(names, result)]
 
 @builtin.globals('env')
 def system_package(env, name, search_dirs=None, static=False):
     if search_dirs is None:
         search_dirs = env.lib_dirs
-    return Package([], [], [_find_library(env, name, search_dirs, static)])
+    return Package([], [], _find_libraries(env, [name], search_dirs, static))
+
+_pkg_config_vars = ['PATH', 'PKG_CONFIG', 'PKG_CONFIG_PATH',
+                    'PKG_CONFIG_LIBDIR', 'PKG_CONFIG_SYSROOT_DIR']
+
+def _encode(value):
+    # The environment's variables are unicode once it's been saved and
+    # reloaded, but subprocess needs byte strings. They were UTF-8 when we
+    # saved them as JSON, so turn them back into that.
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+def _run_pkg_config(env, args):
+    proc = subprocess.Popen(
+        [_encode(i) for i in [env.getvar('PKG_CONFIG', 'pkg-config')] + args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env={_encode(k): _encode(v) for k, v in env.variables.iteritems()}
+    )
+    output, error = proc.communicate()
+    return proc.returncode, output, error
+
+def _pkg_config_path(env):
+    paths = env.getvar('PKG_CONFIG_PATH', '').split(os.pathsep)
+    libdir = env.getvar('PKG_CONFIG_LIBDIR')
+    if libdir is None:
+        libdir = env.probe(
+            'pkg_config_path',
+            lambda: _run_pkg_config(env, ['--variable', 'pc_path',
+                                          'pkg-config'])[1].strip(),
+            ['PATH', 'PKG_CONFIG']
+        )
+    return [os.path.abspath(i) for i in paths + libdir.split(os.pathsep)
+            if i]
+
+def _pkg_config_files(names, search_dirs):
+    # Find the .pc file pkg-config will use for each module (the first one in
+    # the search path) so that we notice if it's edited in place. Anything
+    # else that changes the result (e.g. installing a module it requires) will
+    # change one of the search dirs.
+    for name in names:
+        module = re.split(r'[\s<>=!]', name)[0] + '.pc'
+        for d in search_dirs:
+            pcfile = os.path.join(d, module)
+            if fs.exists(pcfile):
+                yield pcfile
+                break
+
+def _pkg_config(env, names, static):
+    def parse(args, prefixes, other):
+        returncode, output, error = _run_pkg_config(env, args + names)
+        if returncode != 0:
+            raise PackageResolutionError(error.strip())
+
+        result = {key: [] for prefix, key in prefixes + [(None, other)]}
+        for i in pshell.split(output):
+            for prefix, key in prefixes:
+                if i.startswith(prefix):
+                    value = i[2:]
+                    if key == 'libs':
+                        # Keep libraries in order, duplicates and all, since
+                        # static links can depend on it.
+                        result[key].append(value)
+                    elif not os.path.isabs(value):
+                        raise PackageResolutionError(
+                            'pkg-config returned a relative path: {!r}'
+                            .format(i)
+                        )
+                    elif value not in result[key]:
+                        result[key].append(value)
+                    break
+            else:
+                # Anything else (e.g. -D or -pthread) gets passed along as-is.
+                result[other].append(i)
+        return result
+
+    def run():
+        try:
+            result = parse(['--cflags'], [('-I', 'includes')],
+                           'compile_options')
+            result.update(parse(
+                ['--libs'] + (['--static'] if static else []),
+                [('-L', 'lib_dirs'), ('-l', 'libs')], 'link_options'
+            ))
+        except PackageResolutionError as e:
+            return {'error': str(e)}
+        return result
+
+    # Don't run pkg-config at all when regenerating unless its search path has
+    # changed.
+    search_dirs = _pkg_config_path(env)
+    return env.probe('pkg_config:' + json.dumps([names, static]), run,
+                     _pkg_config_vars,
+                     search_dirs + list(_pkg_config_files(names, search_dirs)))
+
+@builtin.globals('env')
+def pkg_config_package(env, *names, **kwargs):
+    static = kwargs.pop('static', False)
+    if kwargs:
+        raise TypeError('unexpected keyword argument {!r}'
+                        .format(next(iter(kwargs))))
+    if len(names) == 0:
+        raise ValueError('expected at least one argument')
+
+    try:
+        result = _pkg_config(env, list(names), static)
+    except OSError as e:
+        result = {'error': 'unable to run pkg-config: {}'.format(e)}
+    if 'error' in result:
+        raise PackageResolutionError("unable to find package '{}': {}".format(
+            ', '.join(names), result['error']
+        ))
+
+    search_dirs = result['lib_dirs'] + env.lib_dirs
+    return Package(
+        system_includes=[HeaderDirectory(i, path.Root.absolute)
+                         for i in result['includes']],
+        libraries=_find_libraries(env, result['libs'], search_dirs, static),
+        lib_dirs=[path.Path(i, path.Root.absolute)
+                  for i in result['lib_dirs']],
+        compile_options=result['compile_options'],
+        link_options=result['link_options'],
+    )
 
 class BoostPackage(Package):
     def __init__(self, includes=None, system_includes=None, libraries=None,
@@ -45,19 +198,38 @@ class BoostPackage(Package):
         Package.__init__(self, includes, system_includes, libraries, lib_dirs)
         self.version = version
 
-def _boost_version(headers, required_version=None):
-    version_hpp = headers.path.append('boost').append('version.hpp')
-    with open(version_hpp.string()) as f:
-        for line in f:
-            m = re.match(r'#\s*define\s+BOOST_LIB_VERSION\s+"([\d_]+)"', line)
-            if m:
-                version = Version(m.group(1).replace('_', '.'))
-                check_version(version, required_version, 'Boost')
-                return version
-    raise IOError('unable to parse "boost/version.hpp"')
+def _boost_version(include_dir):
+    version_hpp = os.path.join(include_dir, 'boost', 'version.hpp')
+    m = re.search(r'^#\s*define\s+BOOST_LIB_VERSION\s+"([\d_]+)"',
+                  fs.read(version_hpp), re.MULTILINE)
+    if not m:
+        raise IOError('unable to parse "boost/version.hpp"')
+    return m.group(1).replace('_', '.')
+
+def _find_boost(env, candidates):
+    def find():
+        error = None
+        for i in candidates:
+            try:
+                return {'include': i, 'version': _boost_version(i)}
+            except IOError as e:
+                error = str(e)
+        return {'error': error}
+
+    # Only look for the headers once, no matter how many times boost_package()
+    # is called. We need to look again if a version.hpp is added, removed, or
+    # changed in any of the candidate directories.
+    result = env.probe(
+        'boost:' + json.dumps(candidates), find, (),
+        [os.path.join(i, 'boost', 'version.hpp') for i in candidates]
+    )
+    if 'error' in result:
+        raise IOError(result['error'])
+    return result['include'], result['version']
 
 @builtin.globals('env')
 def boost_package(env, name=None, version=None):
+    from packaging.version import Version
     version = make_specifier(version)
 
     root = env.getvar('BOOST_ROOT')
@@ -66,47 +238,44 @@ def boost_package(env, name=None, version=None):
     lib_var = env.getvar('BOOST_LIBRARYDIR', os.path.join(root, 'lib')
                          if root else None)
 
+    default_dir = None
     if inc_var:
-        headers = [HeaderDirectory(inc_var, path.Root.absolute)]
-        boost_version = _boost_version(headers[0])
+        candidates = [inc_var]
     else:
-        # On Windows, check the default install location, which is structured
-        # differently from other install locations.
+        candidates = list(env.platform.include_dirs)
+        # On Windows, check the default install location first, which is
+        # structured differently from other install locations.
         if env.platform.name == 'windows':
             dirs = find(r'C:\Boost\include', 'boost-*', type='d', flat=True)
             if dirs:
-                try:
-                    headers = [HeaderDirectory(max(dirs), path.Root.absolute)]
-                    boost_version = _boost_version(headers[0])
-                    return BoostPackage(headers, lib_dirs=r'C:\Boost\lib',
-                                        version=_boost_version(headers[0]))
-                except IOError:
-                    pass
-
-        if not env.platform.include_dirs:
+                default_dir = max(dirs)
+                candidates.insert(0, default_dir)
+        if not candidates:
             raise ValueError('unable to find Boost on system')
-        for i in env.platform.include_dirs:
-            try:
-                headers = [HeaderDirectory(i, path.Root.absolute)]
-                boost_version = _boost_version(headers[0])
-                break
-            except IOError as e:
-                pass
-        else:
-            raise e
 
-    if env.platform.name == 'windows':
+    include_dir, boost_version = _find_boost(env, candidates)
+    boost_version = Version(boost_version)
+    check_version(boost_version, version, 'Boost')
+    headers = [HeaderDirectory(include_dir, path.Root.absolute)]
+
+    if include_dir == default_dir:
+        return BoostPackage(headers, lib_dirs=r'C:\Boost\lib',
+                            version=boost_version)
+    elif env.platform.name == 'windows':
         if not env.linker('c++').auto_link:
             # XXX: Don't require auto-link.
             raise ValueError('Boost on Windows requires auto-link')
         return BoostPackage([], headers, lib_dirs=listify(lib_var),
                             version=boost_version)
     else:
-        dirs = [lib_var] if lib_var else env.platform.lib_dirs
-        libraries = [_find_library(env, 'boost_' + i, dirs)
-                     for i in iterate(name)]
-        return BoostPackage([], headers, libraries=libraries, version=boost_version)
+        dirs = [lib_var] if lib_var else env.platform_lib_dirs
+        libraries = _find_libraries(env, ['boost_' + i for i in iterate(name)],
+                                    dirs)
+        return BoostPackage([], headers, libraries=libraries,
+                            version=boost_version)
 
 @builtin.globals('env')
 def system_executable(env, name):
-    return Executable(which(name, env.variables), root=path.Root.absolute)
+    exe = env.probe('which:' + json.dumps(name),
+                    lambda: which(name, env.variables), ['PATH', 'PATHEXT'])
+    return Executable(exe, root=path.Root.absolute)
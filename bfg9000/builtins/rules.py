@@ -54,7 +54,8 @@ class Compile(Edge):
         self.builder = env.compiler(self.file.lang)
         self.include = sum((i.includes for i in iterate(packages)), include)
         self.system_include = sum((i.system_includes for i in iterate(packages)), system_include)
-        self.options = pshell.listify(options)
+        self.options = sum((i.compile_options for i in iterate(packages)),
+                           pshell.listify(options))
         self.internal_options = []
 
         target = self.builder.output_file(name, self.file.lang)
@@ -97,7 +98,9 @@ class Link(Edge):
 
         lib_dirs = (self.builder.lib_dirs(i.lib_dirs)
                     for i in iterate(packages))
-        self.options = sum(lib_dirs, pshell.listify(link_options))
+        self.options = sum(chain(lib_dirs, (i.link_options
+                                            for i in iterate(packages))),
+                           pshell.listify(link_options))
         self.name = self.__name(name, mode)
 
         target = self.builder.output_file(name)
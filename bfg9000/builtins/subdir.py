@@ -0,0 +1,214 @@
+import cPickle as pickle
+import hashlib
+import os
+
+from . import builtin, bind
+from .find import check_queries
+from .. import probe_cache
+from ..atomic_write import atomic_write
+from ..build_inputs import BuildInputs
+from ..timings import timer
+from ..version import version as bfg_version
+
+bfgfile = 'build.bfg'
+cachefile = '.bfg_subdirs'
+_in_worker = False
+
+def _file_hash(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except IOError:
+        return None
+
+_pickle_errors = (pickle.PicklingError, TypeError, AttributeError)
+
+def _picklable(value):
+    try:
+        pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return True
+    except _pickle_errors:
+        return False
+
+class FragmentCache(object):
+    version = 4
+
+    def __init__(self):
+        self.path = None
+        self._entries = {}
+        self._used = {}
+        self._dirty = False
+
+    def attach(self, path):
+        self.path = path
+        try:
+            with open(path, 'rb') as inp:
+                state = pickle.load(inp)
+        except Exception:
+            return
+
+        # Like the build snapshot, this holds pickled objects, so it's only
+        # usable by the exact version of bfg9000 that created it.
+        if ( state['version'] == self.version and
+             state['bfg_version'] == bfg_version ):
+            self._entries = state['entries']
+
+    def lookup(self, path, fingerprint, env):
+        entry = self._entries.get(path)
+        if ( entry is None or entry['env'] != fingerprint or
+             any(_file_hash(f) != h for f, h in entry['files']) or
+             ( check_queries(entry['queries'], env) !=
+               entry['build'].find_dirs ) or
+             not env.restore_probes(entry['probes']) ):
+            return None
+        self._used[path] = entry
+        return entry['build']
+
+    def store(self, path, fingerprint, build, probes):
+        self._used[path] = {
+            'env': fingerprint,
+            'files': [(i, _file_hash(i)) for i in build.bfg_files],
+            'queries': build.find_queries,
+            'probes': probes,
+            'build': build,
+        }
+        self._dirty = True
+
+    def collect(self):
+        # Return the entries used since the last call and forget them, so that
+        # a worker process can send them back to be merged into the parent's
+        # cache (see `merge`).
+        result = (self._used, self._dirty)
+        self._used = {}
+        self._dirty = False
+        return result
+
+    def merge(self, used, dirty):
+        self._used.update(used)
+        self._dirty = self._dirty or dirty
+
+    def save(self):
+        # Only keep the entries we used this time around, so that the cache
+        # doesn't hold on to subdirectories that no longer exist.
+        if not self.path or not (self._dirty or
+                                 set(self._used) != set(self._entries)):
+            return
+        entries = self._used
+        try:
+            data = self._dumps(entries)
+        except _pickle_errors:
+            # Something a subdirectory exported can't be pickled (e.g. a
+            # function defined in its build.bfg), so don't cache that one.
+            entries = {k: v for k, v in entries.iteritems()
+                       if _picklable(v)}
+            data = self._dumps(entries)
+        atomic_write(self.path, data)
+        self._entries = entries
+        self._used = {}
+        self._dirty = False
+
+    def _dumps(self, entries):
+        return pickle.dumps({
+            'version': self.version,
+            'bfg_version': bfg_version,
+            'entries': entries,
+        }, pickle.HIGHEST_PROTOCOL)
+
+cache = FragmentCache()
+
+def _execute(env, path):
+    build = BuildInputs()
+    filename = os.path.join(path, bfgfile)
+    build.bfg_files.append(filename)
+    with env.record_probes() as probes:
+        execfile(filename, bind(build_inputs=build, env=env))
+    return build, probes
+
+def _init_worker():
+    # Pool workers are daemonic, so they can't start pools of their own.
+    global _in_worker
+    _in_worker = True
+    # Forget what we inherited from the parent so that we only send back what
+    # happened here.
+    cache.collect()
+    timer.collect()
+
+def _execute_worker(args):
+    # The probes come back along with the build so that the parent can merge
+    # them into its environment. Since the build is pickled as a whole, its
+    # edges will still refer to the same nodes that were exported. Any nested
+    # subdirs ran (or were looked up) here, so their cache entries and timings
+    # come back too.
+    build, probes = _execute(*args)
+    return build, probes, cache.collect(), timer.collect()
+
+@builtin.globals('build_inputs')
+def export(build, **kwargs):
+    build.exports.update(kwargs)
+
+@builtin.globals('build_inputs', 'env')
+def subdir(build, env, *paths, **kwargs):
+    jobs = kwargs.pop('jobs', None)
+    if kwargs:
+        raise TypeError('unexpected keyword argument {!r}'
+                        .format(next(iter(kwargs))))
+    if len(paths) == 0:
+        raise ValueError('expected at least one argument')
+
+    # Reuse the results of any subdirectory whose build files, environment,
+    # find_files() results, and probes are the same as last time.
+    paths = [os.path.normpath(i) for i in paths]
+    fingerprint = env.fingerprint()
+    subbuilds = [cache.lookup(i, fingerprint, env) for i in paths]
+    missing = [i for i, b in zip(paths, subbuilds) if b is None]
+
+    # Most builds never get here, so don't make everyone pay for importing
+    # this.
+    import multiprocessing
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+    jobs = min(jobs, len(missing))
+
+    if jobs > 1 and not _in_worker:
+        from multiprocessing.pool import MaybeEncodingError
+        # The workers would inherit any probes still running in the
+        # background and all try to read the same pipes, so finish them here
+        # first; the workers will find the results in the cache.
+        probe_cache.finish_pending()
+        pool = multiprocessing.Pool(jobs, _init_worker)
+        try:
+            results = [pool.apply_async(_execute_worker, [(env, i)])
+                       for i in missing]
+            executed = []
+            for path, result in zip(missing, results):
+                try:
+                    subbuild, probes, used, timings = result.get()
+                except MaybeEncodingError:
+                    # The worker couldn't send its results back (e.g. it
+                    # exported a function defined in its build.bfg), so run
+                    # this one here instead.
+                    executed.append(_execute(env, path))
+                    continue
+                env.merge_probes(probes)
+                cache.merge(*used)
+                timer.merge(*timings)
+                executed.append((subbuild, probes))
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        executed = [_execute(env, i) for i in missing]
+
+    executed = dict(zip(missing, executed))
+    for i, path in enumerate(paths):
+        if subbuilds[i] is None:
+            subbuilds[i], probes = executed[path]
+            cache.store(path, fingerprint, subbuilds[i], probes)
+
+    # Merge in the order the subdirectories were listed so that the result
+    # doesn't depend on which one happened to finish first.
+    for i in subbuilds:
+        build.merge(i)
+
+    exports = [i.exports for i in subbuilds]
+    return exports[0] if len(exports) == 1 else exports
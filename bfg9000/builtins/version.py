@@ -1,17 +1,15 @@
 import platform
-from packaging.specifiers import SpecifierSet
-from packaging.version import Version
 
 from . import builtin
 from ..version import version as _bfg_version
 from ..build_inputs import objectify
 
-_bfg_version = Version(_bfg_version)
-_python_version = Version(platform.python_version())
-
 def make_specifier(s, prereleases=None):
     if s is None:
         return None
+    # packaging is fairly slow to import, so only import it once a build.bfg
+    # file actually asks about versions.
+    from packaging.specifiers import SpecifierSet
     return objectify(s, SpecifierSet, None, prereleases=prereleases)
 
 def check_version(version, specifier, kind):
@@ -21,8 +19,11 @@ def check_version(version, specifier, kind):
 
 @builtin
 def bfg9000_required_version(version=None, python_version=None):
-    version = make__specifier(version, prereleases=True)
+    from packaging.version import Version
+
+    version = make_specifier(version, prereleases=True)
     python_version = make_specifier(python_version, prereleases=True)
 
-    check_version(_bfg_version, version, kind='bfg9000')
-    check_version(_python_version, python_version, kind='python')
+    check_version(Version(_bfg_version), version, kind='bfg9000')
+    check_version(Version(platform.python_version()), python_version,
+                  kind='python')
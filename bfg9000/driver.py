@@ -1,12 +1,19 @@
 import argparse
 import os
-import pickle
 import re
 import sys
+import time
+import traceback
 
 from . import builtins
-from .backends import get_backends
-from .build_inputs import BuildInputs
+from . import fs_cache
+from . import probe_cache
+from .memory import tracker
+from .timings import timer
+from .backends import (get_backend, get_backends, list_backends,
+                       usable_backend)
+from .builtins import find, subdir
+from .build_inputs import BuildInputs, SnapshotVersionError
 from .environment import Environment, EnvVersionError
 from .path import Path, InstallRoot
 from .platforms import platform_info
@@ -25,6 +32,15 @@ def samefile(path1, path2):
         # be necessary for Windows with Python 2.x.
         return os.path.realpath(path1) == os.path.realpath(path2)
 
+# These options take an optional file name, but only in the "--option=FILE"
+# form. Otherwise, "--timings srcdir builddir" would write to srcdir.
+_optional_file_opts = ['--timings', '--memory-report']
+
+def _expand_optional_files(args):
+    if args is None:
+        args = sys.argv[1:]
+    return [i + '=-' if i in _optional_file_opts else i for i in args]
+
 def parse_args(parser, args=None, namespace=None):
     def check_dir(path, check_exist=False):
         if not os.path.exists(path):
@@ -32,7 +48,16 @@ def parse_args(parser, args=None, namespace=None):
         if not os.path.isdir(path):
             parser.error("'{}' is not a directory".format(path))
 
-    args = parser.parse_args(args, namespace)
+    args = parser.parse_args(_expand_optional_files(args), namespace)
+
+    if args.watch:
+        if args.from_snapshot:
+            parser.error('--watch and --from-snapshot are incompatible')
+        args.regenerate = True
+    if args.from_snapshot and not args.regenerate:
+        parser.error('--from-snapshot requires --regenerate')
+    if args.only_if_changed and not args.regenerate:
+        parser.error('--only-if-changed requires --regenerate')
 
     if not args.regenerate:
         if not args.srcdir:
@@ -71,8 +96,51 @@ def parse_args(parser, args=None, namespace=None):
 
     return args
 
+def preparse_args(args=None):
+    # Peek at the options we need before the backends are loaded. Positional
+    # arguments are left alone, since we can't tell them apart from the values
+    # of options we don't know about.
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--regenerate', action='store_true')
+    parser.add_argument('--watch', action='store_true')
+    parser.add_argument('--reprobe', action='store_true')
+    parser.add_argument('--timings')
+    parser.add_argument('--memory-report')
+    return parser.parse_known_args(_expand_optional_files(args))[0]
+
 def main():
-    backends = get_backends()
+    preargs = preparse_args()
+    timer.enabled = preargs.timings is not None
+    if preargs.memory_report is not None:
+        tracker.start()
+    # Only write the reports once we've actually run. If argparse exits (e.g.
+    # for --help or a bad argument), there's nothing to report.
+    result = _main(preargs)
+    if timer.enabled:
+        timer.dump(preargs.timings)
+    if tracker.enabled:
+        tracker.dump(preargs.memory_report)
+    return result
+
+def _main(preargs):
+    fs_cache.cache.enabled = True
+    probe_cache.cache.reprobe = preargs.reprobe
+    probe_cache.cache.attach(os.path.join(probe_cache.user_cache_dir(),
+                                          'probes.json'), shared=True)
+    regenerate = preargs.regenerate or preargs.watch
+
+    with timer.timed('phases', 'backend_discovery'):
+        if regenerate:
+            # We already know which backend to use, so don't bother loading
+            # (and probing) all the others.
+            backend_names = list_backends()
+            default_backend = 'current backend'
+        else:
+            # Probe the platform while we're probing the backends.
+            platform_info().start_probes()
+            backends = get_backends()
+            backend_names = backends.keys()
+            default_backend = backend_names[0]
     install_dirs = platform_info().install_dirs
 
     path_help = 'installation path for {} (default: %(default)r)'
@@ -84,9 +152,8 @@ def main():
     parser.add_argument('builddir', nargs='?', help='build directory')
     parser.add_argument('--version', action='version',
                         version='%(prog)s ' + version)
-    parser.add_argument('--backend', choices=backends.keys(),
-                        default=backends.keys()[0],
-                        help='backend (default: %(default)s)')
+    parser.add_argument('--backend', choices=backend_names,
+                        help='backend (default: {})'.format(default_backend))
     parser.add_argument('--prefix', type=path_arg, metavar='PATH',
                         default=install_dirs[InstallRoot.prefix],
                         help='installation prefix (default: %(default)r)')
@@ -101,38 +168,173 @@ def main():
                         help=path_help.format('headers'))
     parser.add_argument('--regenerate', action='store_true',
                         help='regenerate build files')
+    parser.add_argument('--reprobe', action='store_true',
+                        help='ignore cached results when probing for tools')
+    parser.add_argument('--watch', action='store_true',
+                        help='regenerate build files whenever build.bfg or ' +
+                             'a directory it searched changes')
+    parser.add_argument('--from-snapshot', action='store_true',
+                        help='regenerate build files from the saved build ' +
+                             'graph without executing build.bfg')
+    # This is passed by the build files' regenerate rule, which is also run
+    # when a directory searched by find_files() changes.
+    parser.add_argument('--only-if-changed', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--timings', metavar='FILE',
+                        help='write a JSON report of the time spent in each ' +
+                             'step to stdout (or FILE, with --timings=FILE)')
+    parser.add_argument('--memory-report', metavar='FILE',
+                        help='write a JSON report of memory usage to stdout ' +
+                             '(or FILE, with --memory-report=FILE)')
 
     args = parse_args(parser)
+    if regenerate and args.backend and not usable_backend(args.backend):
+        # We only listed the backends' names above, so check that this one
+        # actually works before we go any further.
+        parser.error("backend '{}' is not available".format(args.backend))
+    # Nothing has been probed yet (when regenerating, the backend isn't even
+    # loaded until we write the build files), so it's not too late to use the
+    # build directory's cache.
+    probe_cache.cache.attach(args.builddir.append(probe_cache.cachefile)
+                             .string())
     if args.regenerate:
         try:
-            env = Environment.load(args.builddir.string())
+            with timer.timed('phases', 'environment'):
+                env = Environment.load(args.builddir.string())
         except Exception as e:
             sys.stderr.write('{prog}: error loading environment: {msg}\n'
                              .format(prog=parser.prog, msg=e))
             if isinstance(e, EnvVersionError):
                 sys.stderr.write('Please re-run bfg9000 manually.\n')
             return 1
+        if args.backend:
+            env.backend = args.backend
     else:
         # De-munge the entry point if we're on Windows.
         bfgpath = os.path.realpath(re.sub('-script.py$', '.exe', sys.argv[0]))
-        env = Environment(
-            bfgpath=bfgpath,
-            backend=args.backend,
-            srcdir=args.srcdir,
-            builddir=args.builddir,
-            install_dirs={
-                InstallRoot.prefix: args.prefix,
-                InstallRoot.bindir: args.bindir,
-                InstallRoot.libdir: args.libdir,
-                InstallRoot.includedir: args.includedir,
-            }
-        )
+        with timer.timed('phases', 'environment'):
+            env = Environment(
+                bfgpath=bfgpath,
+                backend=args.backend or default_backend,
+                srcdir=args.srcdir,
+                builddir=args.builddir,
+                install_dirs={
+                    InstallRoot.prefix: args.prefix,
+                    InstallRoot.bindir: args.bindir,
+                    InstallRoot.libdir: args.libdir,
+                    InstallRoot.includedir: args.includedir,
+                }
+            )
         env.save(args.builddir.string())
 
-    build = BuildInputs()
     os.chdir(env.srcdir.string())
-    execfile(env.srcdir.append(bfgfile).string(), builtins.bind(
-        build_inputs=build, env=env
-    ))
+    if args.watch:
+        return _watch(parser, env, args.backend)
+    return _configure(parser, env, args.from_snapshot, args.backend,
+                      args.only_if_changed)
+
+def _configure(parser, env, from_snapshot=False, backend=None,
+               only_if_changed=False):
+    # When watching, the filesystem has changed since our last run.
+    fs_cache.cache.clear()
+    if from_snapshot:
+        try:
+            with timer.timed('phases', 'load_snapshot'):
+                build = BuildInputs.load(env.builddir.string())
+        except Exception as e:
+            sys.stderr.write('{prog}: error loading build snapshot: {msg}\n'
+                             .format(prog=parser.prog, msg=e))
+            if isinstance(e, SnapshotVersionError):
+                sys.stderr.write('Please re-run bfg9000 --regenerate.\n')
+            return 1
+    else:
+        find.dircache.attach(env.builddir.append(find.dircache_name)
+                             .string())
+        if ( only_if_changed and not backend and
+             not probe_cache.cache.reprobe ):
+            # If the build system is only regenerating because a directory
+            # searched by find_files() changed, but the files it found didn't,
+            # there's nothing to do but tell it that we're up to date.
+            with timer.timed('phases', 'check_find_queries'):
+                output = find.check_queryfile(
+                    env.builddir.append(find.queryfile_name).string(), env
+                )
+            if output:
+                find.dircache.save()
+                os.utime(env.builddir.append(output).string(), None)
+                return 0
+
+        subdir.cache.attach(env.builddir.append(subdir.cachefile).string())
+        build = BuildInputs()
+        with timer.timed('phases', 'execute'):
+            execfile(env.srcdir.append(bfgfile).string(), builtins.bind(
+                build_inputs=build, env=env
+            ))
+        tracker.snapshot('execute')
+        with timer.timed('phases', 'save_snapshot'):
+            build.save(env.builddir.string())
+            subdir.cache.save()
+            find.dircache.save()
+            env.prune_probes()
+
+    for e in build.edges:
+        timer.count('edges', type(e).__name__)
+    with timer.timed('phases', 'generate'):
+        get_backend(env.backend).write(env, build)
+
+    # Save the environment again so that anything probed while executing the
+    # build.bfg file is available when regenerating.
+    env.save(env.builddir.string())
+    probe_cache.cache.save()
+    return 0
+
+def _watched_paths(env):
+    try:
+        build = BuildInputs.load(env.builddir.string())
+    except Exception:
+        return [], [env.srcdir.append(bfgfile).string()]
+
+    files = [env.srcdir.append(i).string()
+             for i in [bfgfile] + build.bfg_files]
+    dirs = []
+    for i in build.find_dirs:
+        # find_dirs also holds files whose changes can affect what
+        # find_files() returns (e.g. ignore files).
+        (dirs if os.path.isdir(i) else files).append(i)
+    return dirs, files
+
+def _watch(parser, env, backend=None):
+    # This pulls in ctypes, so only import it when we're actually watching.
+    from . import watch
+    watcher = watch.watcher()
+    only_if_changed = False
+    dirs, files = [], []
+    try:
+        while True:
+            start = time.time()
+            mtimes = watch.mtimes(dirs + files)
+            try:
+                _configure(parser, env, backend=backend,
+                           only_if_changed=only_if_changed)
+            except Exception:
+                traceback.print_exc()
+            # Only switch backends (or reprobe) the first time through; after
+            # that, we're just reacting to changes like the build system would.
+            backend = None
+            probe_cache.cache.reprobe = False
+            only_if_changed = True
 
-    backends[env.backend].write(env, build)
+            dirs, files = _watched_paths(env)
+            watcher.watch(dirs, files)
+            # Anything that changed while we were configuring happened before
+            # the watches were set up, so check for that ourselves.
+            if watch.changed_since(dirs + files, mtimes, start):
+                continue
+            sys.stderr.write('{prog}: watching {n} paths for changes\n'
+                             .format(prog=parser.prog,
+                                     n=len(dirs) + len(files)))
+            watcher.wait()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
@@ -1,6 +1,9 @@
+import hashlib
 import json
 import os
+from contextlib import contextmanager
 
+from .fs_cache import cache as fs
 from .path import Path, InstallRoot
 from . import platforms
 from . import tools
@@ -8,14 +11,21 @@ from . import tools
 class EnvVersionError(RuntimeError):
     pass
 
+def _path_signature(path):
+    st = fs.stat(path)
+    return None if st is None else [st.st_mtime, st.st_ino, st.st_size]
+
 class Environment(object):
-    version = 5
+    version = 7
     envfile = '.bfg_environ'
 
     def __new__(cls, *args, **kwargs):
         env = object.__new__(cls, *args, **kwargs)
         env.__builders = {}
         env.__tools = {}
+        env.__probes = {}
+        env.__used_probes = {}
+        env.__recording = []
         return env
 
     def __init__(self, bfgpath, backend, srcdir, builddir, install_dirs):
@@ -50,7 +60,68 @@ class Environment(object):
     def lib_dirs(self):
         paths = self.getvar('LIBRARY_PATH')
         paths = paths.split(os.pathsep) if paths else []
-        return paths + self.platform.lib_dirs
+        return paths + self.platform_lib_dirs
+
+    @property
+    def platform_lib_dirs(self):
+        # XXX: The platform looks up `ld` in the current environment, not
+        # ours. This should be fixed once we support cross-compilation.
+        return self.probe('platform_lib_dirs', lambda: self.platform.lib_dirs,
+                          ['PATH'])
+
+    def probe(self, name, fn, variables=(), paths=()):
+        # Remember the result of an expensive query of the system (e.g. running
+        # a tool) so that it's saved along with the environment and never
+        # re-run on regeneration unless the variables it depends on change, or
+        # any of the paths it depends on are modified.
+        keyvars, keypaths = self.__probe_key(variables, paths)
+        cached = self.__probes.get(name)
+        if ( cached is None or cached['variables'] != keyvars or
+             cached.get('paths', {}) != keypaths ):
+            cached = {'variables': keyvars, 'paths': keypaths, 'result': fn()}
+        self.__use_probe(name, cached)
+        return cached['result']
+
+    def __probe_key(self, variables, paths):
+        return ({i: self.getvar(i) for i in variables},
+                {i: _path_signature(i) for i in paths})
+
+    def __use_probe(self, name, entry):
+        self.__probes[name] = self.__used_probes[name] = entry
+        for i in self.__recording:
+            i[name] = entry
+
+    @contextmanager
+    def record_probes(self):
+        # Collect every probe consulted within this block, so that anything
+        # derived from them (e.g. a cached subdirectory) can tell when they've
+        # gone stale.
+        probes = {}
+        self.__recording.append(probes)
+        try:
+            yield probes
+        finally:
+            self.__recording.pop()
+
+    def merge_probes(self, probes):
+        for name, entry in probes.iteritems():
+            self.__use_probe(name, entry)
+
+    def prune_probes(self):
+        # Only keep the probes used since the last time we pruned, so that
+        # ones for old flags or search dirs don't pile up in the saved
+        # environment.
+        self.__probes = self.__used_probes
+        self.__used_probes = {}
+
+    def restore_probes(self, probes):
+        # Only bring back probes that probe() itself would still reuse.
+        for entry in probes.itervalues():
+            key = (entry['variables'], entry.get('paths', {}))
+            if self.__probe_key(*key) != key:
+                return False
+        self.merge_probes(probes)
+        return True
 
     def compiler(self, lang):
         if lang not in self.__builders:
@@ -71,22 +142,33 @@ class Environment(object):
             self.__tools[name] = tools.get_tool(name, self)
         return self.__tools[name]
 
+    def __state(self):
+        return {
+            'bfgpath': self.bfgpath,
+            'platform': self.platform.name,
+            'variables': self.variables,
+            'srcdir': self.srcdir.to_json(),
+            'builddir': self.builddir.to_json(),
+            'install_dirs': {
+                k.name: v.to_json() for k, v in self.install_dirs.iteritems()
+            },
+        }
+
+    def fingerprint(self):
+        # The backend is left out, since nothing in a build.bfg depends on it,
+        # and so are the probes, since anything that uses them should record
+        # the ones it consulted (see `record_probes`).
+        state = json.dumps(self.__state(), sort_keys=True)
+        return hashlib.sha1(state).hexdigest()
+
     def save(self, path):
+        data = self.__state()
+        data['backend'] = self.backend
+        data['probes'] = self.__probes
         with open(os.path.join(path, self.envfile), 'w') as out:
             json.dump({
                 'version': self.version,
-                'data': {
-                    'bfgpath': self.bfgpath,
-                    'platform': self.platform.name,
-                    'backend': self.backend,
-                    'variables': self.variables,
-                    'srcdir': self.srcdir.to_json(),
-                    'builddir': self.builddir.to_json(),
-                    'install_dirs': {
-                        k.name: v.to_json() for k, v in
-                        self.install_dirs.iteritems()
-                    },
-                }
+                'data': data,
             }, out)
 
     @classmethod
@@ -113,5 +195,7 @@ class Environment(object):
             InstallRoot[k]: Path.from_json(v) for k, v in
             data['install_dirs'].iteritems()
         }
+        if version >= 7:
+            env.__probes = data['probes']
 
         return env
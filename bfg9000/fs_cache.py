@@ -0,0 +1,170 @@
+import errno
+import os
+import stat
+import sys
+
+def _scandir_listdir(scandir):
+    def listdir(path):
+        # The directory entries know their own type (on most filesystems), so
+        # we only need to stat symlinks to find out if they point to a dir.
+        dirs, nondirs, links = [], [], set()
+        for entry in scandir(path):
+            if entry.is_dir():
+                dirs.append(entry.name)
+                if entry.is_symlink():
+                    links.add(entry.name)
+            else:
+                nondirs.append(entry.name)
+        return dirs, nondirs, links
+    return listdir
+
+def _plain_listdir(path):
+    dirs, nondirs, links = [], [], set()
+    for name in os.listdir(path):
+        fullpath = os.path.join(path, name)
+        if os.path.isdir(fullpath):
+            dirs.append(name)
+            if os.path.islink(fullpath):
+                links.add(name)
+        else:
+            nondirs.append(name)
+    return dirs, nondirs, links
+
+def _choose_listdir():
+    try:
+        from os import scandir
+    except ImportError:
+        try:
+            # Use the scandir backport's C extension directly. Importing the
+            # backport itself loads ctypes and runs `ldconfig -p` to find
+            # libc, which costs more than it saves on a small regeneration.
+            from _scandir import scandir
+        except ImportError:
+            return _plain_listdir
+    return _scandir_listdir(scandir)
+
+_listdir_impl = None
+
+def _listdir(path):
+    # Pick an implementation the first time we need one, so that runs that
+    # never list a directory don't pay for importing anything.
+    global _listdir_impl
+    if _listdir_impl is None:
+        _listdir_impl = _choose_listdir()
+    return _listdir_impl(path)
+
+def _read_file(path):
+    with open(path) as f:
+        return f.read()
+
+# On these platforms, filesystems usually ignore case, so a name we don't see
+# in a directory listing might still be there with a different case.
+_ignore_case = os.path.normcase('A') == 'a' or sys.platform == 'darwin'
+
+def _names(path):
+    try:
+        names = os.listdir(path)
+    except OSError as e:
+        # If the directory isn't there, neither is anything in it. Otherwise
+        # (e.g. if we can't read it), we'll have to stat things ourselves.
+        if e.errno in (errno.ENOENT, errno.ENOTDIR):
+            return frozenset()
+        raise
+    if _ignore_case:
+        names = [i.lower() for i in names]
+    return frozenset(names)
+
+def _abspath(path):
+    # Avoid normalizing paths that are already absolute; this gets called a
+    # lot, and an unnormalized key is still a correct one.
+    return path if os.path.isabs(path) else os.path.abspath(path)
+
+class FilesystemCache(object):
+    # Remember what we learned about the filesystem while configuring, so that
+    # the same directories aren't listed (or the same files stat'ed) over and
+    # over by different parts of bfg9000. This is only valid for a single run,
+    # so it's disabled until the driver starts one, and cleared before each
+    # run after that. It's shared by the threads that find() uses; at worst, a
+    # race just means doing some work twice.
+    def __init__(self):
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        self._listings = {}
+        self._names = {}
+        self._stats = {}
+        self._files = {}
+
+    def _memoize(self, table, path, fn):
+        # `path` should already be absolute.
+        try:
+            return table[path]
+        except KeyError:
+            try:
+                result = fn(path)
+            except EnvironmentError:
+                result = None
+            table[path] = result
+            return result
+
+    def listdir(self, path):
+        if self.enabled:
+            listing = self._memoize(self._listings, _abspath(path),
+                                    _listdir)
+        else:
+            try:
+                listing = _listdir(path)
+            except EnvironmentError:
+                listing = None
+
+        if listing is None:
+            return [], [], set()
+        # Callers often filter these in place, so hand out copies.
+        dirs, nondirs, links = listing
+        return list(dirs), list(nondirs), set(links)
+
+    def stat(self, path):
+        if self.enabled:
+            return self._memoize(self._stats, _abspath(path), os.stat)
+        try:
+            return os.stat(path)
+        except OSError:
+            return None
+
+    def exists(self, path):
+        if not self.enabled:
+            return os.path.exists(path)
+
+        # Check the parent directory's listing first: when looking through
+        # a list of search directories, most candidates won't be there, and
+        # one listing of each directory is much cheaper than a stat of every
+        # candidate. We still stat the ones we find, since a symlink might be
+        # dangling.
+        path = _abspath(path)
+        dirname, basename = os.path.split(path)
+        if basename:
+            names = self._memoize(self._names, dirname, _names)
+            if names is not None and (
+                (basename.lower() if _ignore_case else basename) not in names
+            ):
+                return False
+        return self._memoize(self._stats, path, os.stat) is not None
+
+    def isdir(self, path):
+        st = self.stat(path) if self.exists(path) else None
+        return st is not None and stat.S_ISDIR(st.st_mode)
+
+    def isfile(self, path):
+        st = self.stat(path) if self.exists(path) else None
+        return st is not None and stat.S_ISREG(st.st_mode)
+
+    def read(self, path):
+        if not self.enabled:
+            return _read_file(path)
+        data = self._memoize(self._files, _abspath(path), _read_file)
+        if data is None:
+            raise IOError("unable to read '{}'".format(path))
+        return data
+
+cache = FilesystemCache()
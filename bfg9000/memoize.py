@@ -0,0 +1,22 @@
+def bounded_memoize(size):
+    # Remember the results of a function that's called with the same
+    # (hashable) arguments over and over. Some arguments are only ever seen
+    # once, though, so the table is only allowed to grow to `size` entries
+    # before we start over.
+    def decorator(fn):
+        cache = {}
+
+        def wrapper(*args):
+            try:
+                return cache[args]
+            except KeyError:
+                result = fn(*args)
+                if len(cache) >= wrapper.size:
+                    cache.clear()
+                cache[args] = result
+                return result
+        wrapper.cache = cache
+        wrapper.size = size
+        wrapper.__name__ = fn.__name__
+        return wrapper
+    return decorator
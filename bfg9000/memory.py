@@ -0,0 +1,94 @@
+import gc
+import sys
+from collections import OrderedDict
+
+from .report import dump_report
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Types we always want to see in the report, since there's usually one (or
+# more) of them per source file or target.
+tracked_types = ['Path', 'jbos', 'escaped_str', 'SourceFile', 'ObjectFile',
+                 'Compile', 'Link', 'Rule', 'Build']
+
+def _max_rss():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports this in kilobytes, but macOS reports it in bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def _type_stats(top):
+    stats = {}
+    for i in gc.get_objects():
+        size = sys.getsizeof(i)
+        if hasattr(i, '__dict__'):
+            size += sys.getsizeof(i.__dict__)
+        entry = stats.setdefault(type(i).__name__, [0, 0])
+        entry[0] += 1
+        entry[1] += size
+
+    names = sorted(stats, key=lambda i: stats[i][1], reverse=True)[:top]
+    names.extend(i for i in tracked_types if i in stats and i not in names)
+    return OrderedDict(
+        (i, OrderedDict([('count', stats[i][0]), ('size', stats[i][1])]))
+        for i in names
+    )
+
+def _allocation_sites(top):
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ])
+    return [OrderedDict([
+        ('file', i.traceback[0].filename),
+        ('line', i.traceback[0].lineno),
+        ('count', i.count),
+        ('size', i.size),
+    ]) for i in snapshot.statistics('lineno')[:top]]
+
+class MemoryTracker(object):
+    version = 1
+
+    def __init__(self, top=20):
+        self.enabled = False
+        self.top = top
+        self._snapshots = OrderedDict()
+
+    def start(self):
+        self.enabled = True
+        if tracemalloc:
+            tracemalloc.start()
+
+    def snapshot(self, name):
+        if not self.enabled:
+            return
+
+        result = OrderedDict()
+        if tracemalloc:
+            result['traced'] = tracemalloc.get_traced_memory()[0]
+        result['types'] = _type_stats(self.top)
+        if tracemalloc:
+            result['sites'] = _allocation_sites(self.top)
+        self._snapshots[name] = result
+
+    def report(self):
+        result = OrderedDict([('version', self.version)])
+        if tracemalloc:
+            result['peak_traced'] = tracemalloc.get_traced_memory()[1]
+        result['max_rss'] = _max_rss()
+        result['snapshots'] = self._snapshots
+        return result
+
+    def dump(self, path='-'):
+        dump_report(self.report(), path)
+
+tracker = MemoryTracker()
@@ -1,30 +1,65 @@
 import os.path
+import weakref
 from collections import namedtuple
 from enum import Enum
 from itertools import chain
 
 from . import safe_str
+from .memoize import bounded_memoize
+
+_unset = object()
 
 Root = Enum('Root', ['srcdir', 'builddir', 'absolute'])
 InstallRoot = Enum('InstallRoot', ['prefix', 'bindir', 'libdir', 'includedir'])
 
 class Path(safe_str.safe_string):
-    def __init__(self, path, root=Root.builddir):
-        self.suffix = os.path.normpath(path)
-        if self.suffix == '.':
-            self.suffix = ''
+    # Paths are immutable, and large projects refer to the same ones many
+    # times over, so we only make one of each. This lets us remember things
+    # (like the realized string) on the path itself, and keeps memory usage
+    # proportional to the number of distinct paths. The table only holds
+    # weak references, so paths nobody uses anymore (e.g. from an earlier run
+    # when watching) can still go away.
+    __slots__ = ('suffix', 'root', '_parent', '_realize_vars', '_realized',
+                 '__weakref__')
+    __interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, path, root=Root.builddir):
+        try:
+            return cls.__interned[path, root]
+        except KeyError:
+            pass
+
+        suffix = os.path.normpath(path)
+        if suffix == '.':
+            suffix = ''
 
         if os.path.isabs(path):
-            self.root = Root.absolute
+            real_root = Root.absolute
         elif root == Root.absolute:
             raise ValueError("'{}' is not absolute".format(path))
         else:
-            self.root = root
+            real_root = root
+
+        self = cls.__interned.get((suffix, real_root))
+        if self is None:
+            self = safe_str.safe_string.__new__(cls)
+            self.suffix = suffix
+            self.root = real_root
+            self._parent = None
+            self._realize_vars = self._realized = _unset
+            cls.__interned[suffix, real_root] = self
+        cls.__interned[path, root] = self
+        return self
+
+    def __reduce__(self):
+        return (Path, (self.suffix, self.root))
 
     def parent(self):
         if not self.suffix:
             raise ValueError('already at root')
-        return Path(os.path.dirname(self.suffix), self.root)
+        if self._parent is None:
+            self._parent = Path(os.path.dirname(self.suffix), self.root)
+        return self._parent
 
     def append(self, path):
         return Path(os.path.join(self.suffix, path), self.root)
@@ -41,7 +76,7 @@ class Path(safe_str.safe_string):
         else:
             if self.root != start.root:
                 raise ValueError('source mismatch')
-            return os.path.relpath(self.suffix or '.', start.suffix or '.')
+            return _relpath(self.suffix or '.', start.suffix or '.')
 
     def to_json(self):
         return (self.suffix, self.root.name)
@@ -55,6 +90,18 @@ class Path(safe_str.safe_string):
         return Path(data[0], base)
 
     def realize(self, variables, executable=False):
+        # Variable tables are long-lived (usually they belong to a backend), so
+        # just remember the results for the last one we were given.
+        if variables is not self._realize_vars:
+            self._realize_vars = variables
+            self._realized = [None, None]
+        i = 1 if executable else 0
+        result = self._realized[i]
+        if result is None:
+            result = self._realized[i] = self.__realize(variables, executable)
+        return result
+
+    def __realize(self, variables, executable):
         root = variables[self.root] if self.root != Root.absolute else None
         if executable and root is None and os.path.sep not in self.suffix:
             root = '.'
@@ -72,15 +119,14 @@ class Path(safe_str.safe_string):
         raise NotImplementedError()
 
     def __repr__(self):
-        variables = { i: '$({})'.format(i.name) for i in
-                      chain(Root, InstallRoot) }
-        return '`{}`'.format(self.realize(variables))
+        return '`{}`'.format(self.realize(_repr_vars))
 
     def __hash__(self):
         return hash(self.suffix)
 
     def __eq__(self, rhs):
-        return self.root == rhs.root and self.suffix == rhs.suffix
+        return self is rhs or (self.root == rhs.root and
+                               self.suffix == rhs.suffix)
 
     def __nonzero__(self):
         return self.root != Root.builddir or bool(self.suffix)
@@ -91,6 +137,9 @@ class Path(safe_str.safe_string):
     def __radd__(self, lhs):
         return safe_str.jbos(lhs, self)
 
+_repr_vars = {i: '$({})'.format(i.name) for i in chain(Root, InstallRoot)}
+_relpath = bounded_memoize(65536)(os.path.relpath)
+
 def install_path(path, install_root):
     if path.root == Root.srcdir:
         suffix = os.path.basename(path.suffix)
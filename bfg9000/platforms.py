@@ -4,8 +4,10 @@ import re
 import subprocess
 from collections import namedtuple
 
+from .fs_cache import cache as fs
 from .iterutils import iterate
 from .path import Path, Root, InstallRoot
+from .probe_cache import check_output, prefetch
 
 def platform_name():
     name = platform.system().lower()
@@ -26,6 +28,9 @@ class Platform(object):
     def __init__(self, name):
         self.name = name
 
+    def start_probes(self):
+        pass
+
 class PosixPlatform(Platform):
     @property
     def kind(self):
@@ -69,17 +74,25 @@ class LinuxPlatform(PosixPlatform):
     def has_rpath(self):
         return True
 
+    def start_probes(self):
+        # Ask the linker for its search dirs in the background, since we'll
+        # probably need them once the build.bfg file is executed.
+        try:
+            prefetch([which('ld'), '--verbose'])
+        except IOError:
+            pass
+
     @property
     def lib_dirs(self):
         try:
             # XXX: This probably won't work very well for cross-compilation.
-            output = subprocess.check_output(['ld', '--verbose'])
+            output = check_output([which('ld'), '--verbose'])
             paths = re.findall(r'SEARCH_DIR\("=?(.*?)"\);', output)
             if paths:
                 return paths
         except:
             pass
-        return PosixPlatform.lib_dirs(self)
+        return PosixPlatform.lib_dirs.fget(self)
 
     @staticmethod
     def whole_archive(path):
@@ -169,13 +182,13 @@ def which(names, env=None):
 
     for name in iterate(names):
         if os.path.isabs(name):
-            if os.path.exists(name):
+            if fs.exists(name):
                 return name
         else:
             for path in ['.'] if os.path.dirname(name) else paths:
                 for ext in exts:
                     candidate = os.path.normpath(os.path.join(path, name + ext))
-                    if os.path.exists(candidate):
+                    if fs.exists(candidate):
                         return candidate
 
     raise IOError("unable to find executable '{}'".format(name))
@@ -0,0 +1,201 @@
+import json
+import os
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from .atomic_write import atomic_write
+from .makedirs import makedirs
+
+cachefile = '.bfg_probes'
+
+def user_cache_dir():
+    base = os.getenv('XDG_CACHE_HOME')
+    if not base:
+        if os.name == 'nt':
+            base = os.getenv('LOCALAPPDATA', os.path.expanduser('~'))
+        else:
+            base = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'bfg9000')
+
+def file_signature(path):
+    # The mtime and inode catch an executable being rebuilt or replaced in
+    # place; the size is just a cheap extra check.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime, st.st_ino, st.st_size]
+
+def _decode(output):
+    # Probe output goes into a JSON file, so it has to be valid text; tools
+    # running in a non-UTF-8 locale may print anything, though.
+    return output.decode('utf-8', 'replace')
+
+@contextmanager
+def _locked(path):
+    # The user-level cache is shared by every configure run, and several of
+    # those may be running at once (e.g. configuring a few build directories
+    # in parallel), so take a lock while we merge our results in. Otherwise,
+    # one run could overwrite the entries another just saved.
+    with open(path + '.lock', 'a') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            elif msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class _Probe(object):
+    # Start the process right away, but don't wait for it until someone asks
+    # for the result. (This deliberately avoids threads: the result is often
+    # needed while a module is being imported, and waiting on another thread
+    # then can deadlock on the import lock.)
+    def __init__(self, args):
+        self.args = args
+        self.proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+
+    def get(self):
+        output = self.proc.communicate()[0]
+        if self.proc.returncode:
+            raise subprocess.CalledProcessError(self.proc.returncode,
+                                                self.args, output=output)
+        return output
+
+class ProbeCache(object):
+    version = 1
+
+    def __init__(self):
+        self.reprobe = False
+        self._files = []
+        self._entries = {}
+        self._pending = {}
+        self._shared = set()
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as inp:
+                state = json.load(inp)
+            if state['version'] == ProbeCache.version:
+                return state['data']
+        except Exception:
+            pass
+        return {}
+
+    def attach(self, path, shared=False):
+        # Shared caches (i.e. the user-level one) get their directory created
+        # if need be; for any others, the directory should already exist.
+        path = os.path.abspath(path)
+        if path not in self._files:
+            self._files.append(path)
+            if shared:
+                self._shared.add(path)
+            for k, v in self._read(path).iteritems():
+                self._entries.setdefault(k, v)
+
+    def lookup(self, key, exe):
+        if self.reprobe:
+            return None
+        entry = self._entries.get(key)
+        if entry is None or entry['signature'] != file_signature(exe):
+            return None
+        return entry['result']
+
+    def store(self, key, exe, result):
+        signature = file_signature(exe)
+        if signature is None:
+            return
+        self._entries[key] = {'signature': signature, 'result': result}
+
+    def prefetch(self, args):
+        # Start running a probe in the background, so that it can run at the
+        # same time as any others; check_output() will wait for the result.
+        key = json.dumps(args)
+        if ( key in self._pending or
+             self.lookup(key, os.path.abspath(args[0])) is not None ):
+            return
+        try:
+            self._pending[key] = _Probe(args)
+        except OSError:
+            # Let check_output() report this when someone asks for it.
+            pass
+
+    def check_output(self, args):
+        exe = os.path.abspath(args[0])
+        key = json.dumps(args)
+        result = self.lookup(key, exe)
+        if result is None:
+            pending = self._pending.pop(key, None)
+            if pending:
+                result = _decode(pending.get())
+            else:
+                result = _decode(subprocess.check_output(args))
+            self.store(key, exe, result)
+        return result
+
+    def _merge(self, path):
+        # Merge with whatever is on disk now so that we don't throw away
+        # results saved by other runs sharing this file.
+        old = self._read(path)
+        data = dict(old)
+        data.update(self._entries)
+        if data != old:
+            # The user-level cache is only for us; a build directory's cache
+            # should be as readable as the rest of the build directory.
+            mode = 0o600 if path in self._shared else None
+            atomic_write(path, json.dumps({'version': self.version,
+                                           'data': data}), mode)
+
+    def finish_pending(self):
+        # Wait for any probes that nobody asked for, so that they don't
+        # outlive us, and cache their results so that next time we won't
+        # need to run them at all.
+        for key, pending in self._pending.iteritems():
+            try:
+                self.store(key, os.path.abspath(pending.args[0]),
+                           _decode(pending.get()))
+            except subprocess.CalledProcessError:
+                pass
+        self._pending = {}
+
+    def save(self):
+        self.finish_pending()
+        for path in self._files:
+            try:
+                # Only shared files need locking; nothing else writes to a
+                # build directory while we're configuring it.
+                if path in self._shared:
+                    makedirs(os.path.dirname(path), exist_ok=True)
+                    with _locked(path):
+                        self._merge(path)
+                else:
+                    self._merge(path)
+            except (IOError, OSError):
+                pass
+
+cache = ProbeCache()
+
+def prefetch(args):
+    cache.prefetch(args)
+
+def check_output(args):
+    return cache.check_output(args)
+
+def finish_pending():
+    cache.finish_pending()
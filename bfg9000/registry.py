@@ -0,0 +1,28 @@
+import os
+import re
+
+_quoted = re.compile(r"""['"]([^'"]*)['"]""")
+
+def scan_registrations(path, pattern):
+    # Find which module in the package at `path` registers each name, by
+    # searching their source for `pattern` instead of importing them all.
+    # The pattern's first group is either a bare name (e.g. a function being
+    # decorated) or the decorator's arguments, holding one or more quoted
+    # names.
+    result = {}
+    try:
+        filenames = sorted(os.listdir(path))
+    except OSError:
+        # We're not installed as plain files (e.g. we're in a zipped egg).
+        return result
+
+    for filename in filenames:
+        module, ext = os.path.splitext(filename)
+        if ext != '.py' or module == '__init__':
+            continue
+        with open(os.path.join(path, filename)) as f:
+            source = f.read()
+        for match in pattern.finditer(source):
+            for name in _quoted.findall(match.group(1)) or [match.group(1)]:
+                result.setdefault(name, module)
+    return result
@@ -0,0 +1,11 @@
+import json
+import sys
+
+def dump_report(report, path='-'):
+    # Write a JSON report to `path`, or to stdout if it's "-".
+    if path == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(path, 'w') as out:
+            json.dump(report, out, indent=2)
@@ -1,7 +1,7 @@
 import iterutils
 
 class safe_string(object):
-    pass
+    __slots__ = ()
 
 def safe_str(s):
     if isinstance(s, basestring) or isinstance(s, safe_string):
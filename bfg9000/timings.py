@@ -0,0 +1,97 @@
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from .report import dump_report
+
+try:
+    import resource
+
+    def _cpu_time():
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+except ImportError:
+    # os.times() is much coarser, but it's available on Windows.
+    def _cpu_time():
+        t = os.times()
+        return t[0] + t[1]
+
+def _now():
+    return time.time(), _cpu_time()
+
+class Timings(object):
+    version = 1
+
+    def __init__(self):
+        self.enabled = False
+        self._times = OrderedDict()
+        self._counts = OrderedDict()
+
+    def _record(self, kind, name, wall, cpu):
+        entry = self._times.setdefault(kind, OrderedDict()).setdefault(
+            name, OrderedDict([('calls', 0), ('wall', 0.0), ('cpu', 0.0)])
+        )
+        entry['calls'] += 1
+        entry['wall'] += wall
+        entry['cpu'] += cpu
+
+    @contextmanager
+    def timed(self, kind, name):
+        if not self.enabled:
+            yield
+            return
+
+        start_wall, start_cpu = _now()
+        try:
+            yield
+        finally:
+            end_wall, end_cpu = _now()
+            self._record(kind, name, end_wall - start_wall, end_cpu - start_cpu)
+
+    def wrap(self, kind, name, fn):
+        if not self.enabled:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with self.timed(kind, name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def count(self, kind, name, n=1):
+        if self.enabled:
+            counts = self._counts.setdefault(kind, OrderedDict())
+            counts[name] = counts.get(name, 0) + n
+
+    def collect(self):
+        # Return everything recorded so far and start over, so that a worker
+        # process can send its timings back to be merged into the parent's.
+        result = (self._times, self._counts)
+        self._times = OrderedDict()
+        self._counts = OrderedDict()
+        return result
+
+    def merge(self, times, counts):
+        for kind, names in times.iteritems():
+            for name, other in names.iteritems():
+                entry = self._times.setdefault(kind, OrderedDict()).setdefault(
+                    name, OrderedDict([('calls', 0), ('wall', 0.0),
+                                       ('cpu', 0.0)])
+                )
+                for k in entry:
+                    entry[k] += other[k]
+        for kind, names in counts.iteritems():
+            for name, n in names.iteritems():
+                self.count(kind, name, n)
+
+    def report(self):
+        return OrderedDict([
+            ('version', self.version),
+            ('times', self._times),
+            ('counts', self._counts),
+        ])
+
+    def dump(self, path='-'):
+        dump_report(self.report(), path)
+
+timer = Timings()
@@ -1,10 +1,37 @@
 import importlib
+import os
 import pkgutil
+import re
+
+from ..registry import scan_registrations
 
 _builders = {}
 _tools = {}
 _loaded_tools = False
 
+# The modules defining each of our builders and tools, found by looking for
+# the decorators in their source. This lets us import only the ones that are
+# actually used instead of every module in this package. The driver changes
+# directories before any of them are loaded, so make sure we can still find
+# them.
+__path__ = [os.path.abspath(i) for i in __path__]
+_builder_pattern = re.compile(r'^\s*@builder\((.*)\)', re.M)
+_tool_pattern = re.compile(r'^\s*@tool\((.*)\)', re.M)
+_modules = {}
+
+def _get_modules(pattern):
+    if pattern not in _modules:
+        _modules[pattern] = scan_registrations(__path__[0], pattern)
+    return _modules[pattern]
+
+def _load_tool(registry, pattern, name):
+    if name not in registry:
+        modules = _get_modules(pattern)
+        if name in modules:
+            importlib.import_module('.' + modules[name], __package__)
+        else:
+            _load_tools()
+
 def _load_tools():
     global _loaded_tools
     if not _loaded_tools:
@@ -26,7 +53,7 @@ def builder(*args):
     return wrapper
 
 def get_builder(lang, env):
-    _load_tools()
+    _load_tool(_builders, _builder_pattern, lang)
     try:
         fn, multi = _builders[lang]
         return fn(env, lang) if multi else fn(env)
@@ -40,7 +67,7 @@ def tool(name):
     return wrapper
 
 def get_tool(name, env):
-    _load_tools()
+    _load_tool(_tools, _tool_pattern, name)
     try:
         return _tools[name](env)
     except KeyError:
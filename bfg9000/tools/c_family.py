@@ -1,7 +1,7 @@
 import os.path
 import re
 
-from . import builder, ar, cc, msvc
+from . import builder, ar, cc
 from .. import shell
 
 # XXX: Currently, we tie the linker to a single language, much like the
@@ -32,6 +32,8 @@ class CFamilyBuilder(object):
         ldlibs = shell.split(env.getvar('LDLIBS', ''))
 
         if re.search(r'cl(\.exe)?$', cmd):
+            from . import msvc
+
             origin = os.path.dirname(cmd)
             link_cmd = env.getvar(var + '_LINK', os.path.join(origin, 'link'))
             lib_cmd  = env.getvar(var + '_LIB',  os.path.join(origin, 'lib'))
@@ -0,0 +1,179 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+
+# Changes to a directory's entries (as opposed to the contents of its files).
+_entry_events = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+                 IN_DELETE_SELF | IN_MOVE_SELF)
+_file_events = IN_CLOSE_WRITE | IN_MODIFY | IN_ATTRIB | _entry_events
+
+_event_header = struct.Struct('iIII')
+
+def _split_watches(dirs, files):
+    # Files are watched through their parent directories, since editors often
+    # replace a file instead of writing to it.
+    watches = {}
+    for i in dirs:
+        watches.setdefault(os.path.abspath(i), [False, set()])[0] = True
+    for i in files:
+        dirname, basename = os.path.split(os.path.abspath(i))
+        watches.setdefault(dirname, [False, set()])[1].add(basename)
+    return watches
+
+class InotifyWatcher(object):
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._watches = {}
+
+    def close(self):
+        os.close(self._fd)
+
+    def watch(self, dirs, files):
+        for wd in self._watches:
+            self._rm_watch(self._fd, wd)
+        self._watches = {}
+
+        for path, (entries, names) in _split_watches(dirs, files).iteritems():
+            mask = IN_ONLYDIR | (_file_events if names else _entry_events)
+            wd = self._add_watch(self._fd, path, mask)
+            # The directory might have been removed already; if so, its
+            # parent will tell us about it.
+            if wd >= 0:
+                self._watches[wd] = (entries, names)
+
+    def _read(self, timeout):
+        try:
+            ready = select.select([self._fd], [], [], timeout)[0]
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+        if not ready:
+            return None
+
+        data = os.read(self._fd, 65536)
+        events = []
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = _event_header.unpack_from(data, pos)
+            pos += _event_header.size
+            name = data[pos:pos + length].rstrip('\0')
+            pos += length
+            events.append((wd, mask, name))
+        return events
+
+    def _relevant(self, wd, mask, name):
+        if mask & IN_Q_OVERFLOW:
+            return True
+        if wd not in self._watches:
+            return False
+        entries, names = self._watches[wd]
+        return ( (entries and mask & _entry_events) or
+                 (name in names and mask & _file_events) or
+                 mask & (IN_DELETE_SELF | IN_MOVE_SELF) )
+
+    def wait(self, debounce=0.2):
+        # Block until something we care about changes, then wait for things
+        # to quiet down, since a single save or checkout can generate a flurry
+        # of events.
+        while not any(self._relevant(*i) for i in self._read(None) or []):
+            pass
+        while self._read(debounce) is not None:
+            pass
+
+class PollingWatcher(object):
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self._state = {}
+
+    def close(self):
+        pass
+
+    def _snapshot(self):
+        result = {}
+        for i in self._paths:
+            try:
+                st = os.stat(i)
+                result[i] = (st.st_mtime, st.st_size)
+            except OSError:
+                result[i] = None
+        return result
+
+    def watch(self, dirs, files):
+        self._paths = list(dirs) + list(files)
+        self._state = self._snapshot()
+
+    def wait(self, debounce=0.2):
+        while self._snapshot() == self._state:
+            time.sleep(self.interval)
+        time.sleep(debounce)
+
+def mtimes(paths):
+    result = {}
+    for i in paths:
+        try:
+            result[i] = os.stat(i).st_mtime
+        except OSError:
+            pass
+    return result
+
+def changed_since(paths, before, when):
+    # Check if any of `paths` has been modified since `when`, given `before`,
+    # the mtimes we recorded for (some of) them then. This catches changes
+    # made before we started watching them (e.g. while configuring).
+    ambiguous = False
+    for i in paths:
+        try:
+            mtime = os.stat(i).st_mtime
+        except OSError:
+            # If it's gone, its parent directory changed too.
+            continue
+        if i in before and mtime != before[i]:
+            return True
+        if i not in before and mtime >= when:
+            return True
+        # Some filesystems only store whole seconds, so a file saved during
+        # the same second as `when` might have changed without its mtime
+        # showing it.
+        if mtime == int(mtime) and mtime == int(when):
+            ambiguous = True
+
+    if ambiguous:
+        # Wait until the clock moves on before saying so, so that the next
+        # pass can tell, and we only configure once more than we needed to.
+        time.sleep(max(0, int(when) + 1 - time.time()))
+    return ambiguous
+
+def watcher():
+    try:
+        return InotifyWatcher()
+    except (OSError, AttributeError, TypeError):
+        # We're not on Linux (or inotify isn't available).
+        return PollingWatcher()
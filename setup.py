@@ -48,7 +48,7 @@ setup(
     packages=find_packages(exclude=['test*'] + extra_exclude),
 
     install_requires=['enum-compat', 'packaging'],
-    extras_require={'msbuild': ['lxml']},
+    extras_require={'msbuild': ['lxml'], 'scandir': ['scandir']},
 
     entry_points={
         'console_scripts': [
@@ -0,0 +1,6 @@
+#include <iostream>
+
+int main() {
+  std::cout << "hello from a subdirectory!" << std::endl;
+  return 0;
+}
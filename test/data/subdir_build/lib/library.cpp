@@ -0,0 +1,7 @@
+#include "library.hpp"
+
+#include <iostream>
+
+void hello() {
+  std::cout << "hello, library!" << std::endl;
+}
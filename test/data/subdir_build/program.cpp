@@ -0,0 +1,6 @@
+#include "library.hpp"
+
+int main() {
+  hello();
+  return 0;
+}
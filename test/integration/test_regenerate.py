@@ -25,6 +25,17 @@ class TestRegenerate(IntegrationTest):
         self.build('bar')
         self.assertExists(pjoin(self.builddir, 'bar'))
 
+class TestRegenerateSnapshot(IntegrationTest):
+    def __init__(self, *args, **kwargs):
+        IntegrationTest.__init__(self, 'regenerate', *args, **kwargs)
+
+    @skip_if_backend('msbuild')
+    def test_build(self):
+        self.assertPopen(['bfg9000', '--regenerate', '--from-snapshot',
+                          self.builddir])
+        self.build('foo')
+        self.assertExists(pjoin(self.builddir, 'foo'))
+
 class TestRegenerateGlob(IntegrationTest):
     def __init__(self, *args, **kwargs):
         self.extradir = pjoin(test_data_dir, 'regenerate-glob')
@@ -37,6 +48,28 @@ class TestRegenerateGlob(IntegrationTest):
         shutil.copy(pjoin(self.extradir, src),
                     pjoin(self.srcdir, dest))
 
+    def regenerate(self, *args):
+        # Remove the build snapshot so we can tell whether build.bfg was
+        # executed again.
+        os.unlink(pjoin(self.builddir, '.bfg_build'))
+        self.assertPopen(['bfg9000', '--regenerate'] + list(args) +
+                         [self.builddir])
+        return os.path.exists(pjoin(self.builddir, '.bfg_build'))
+
+    @skip_if_backend('msbuild')
+    def test_only_if_changed(self):
+        self.assertFalse(self.regenerate('--only-if-changed'))
+
+    @skip_if_backend('msbuild')
+    def test_explicit_regenerate(self):
+        self.assertTrue(self.regenerate())
+
+    @skip_if_backend('msbuild')
+    def test_reprobe(self):
+        os.unlink(pjoin(self.builddir, '.bfg_probes'))
+        self.assertTrue(self.regenerate('--only-if-changed', '--reprobe'))
+        self.assertExists(pjoin(self.builddir, '.bfg_probes'))
+
     @skip_if_backend('msbuild')
     def test_add_file(self):
         self.wait()
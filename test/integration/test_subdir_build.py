@@ -0,0 +1,20 @@
+import os.path
+import unittest
+
+from integration import *
+
+class TestSubdirBuild(IntegrationTest):
+    def __init__(self, *args, **kwargs):
+        IntegrationTest.__init__(self, 'subdir_build', *args, **kwargs)
+
+    def test_program(self):
+        self.build(executable('program'))
+        self.assertOutput([executable('program')], 'hello, library!\n')
+
+    def test_hello(self):
+        self.build(executable('hello_world'))
+        self.assertOutput([executable('hello_world')],
+                          'hello from a subdirectory!\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,7 @@
+#include "goodbye.hpp"
+
+#include <iostream>
+
+void english::say_goodbye() {
+  std::cout << "Goodbye!" << std::endl;
+}
@@ -0,0 +1,8 @@
+#ifndef INC_ENGLISH_GOODBYE_HPP
+#define INC_ENGLISH_GOODBYE_HPP
+
+namespace english {
+  void say_goodbye();
+}
+
+#endif
@@ -0,0 +1,7 @@
+#include "goodbye.hpp"
+
+#include <iostream>
+
+void german::say_goodbye() {
+  std::cout << "Auf Wiedersehen!" << std::endl;
+}
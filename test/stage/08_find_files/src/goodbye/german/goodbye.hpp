@@ -0,0 +1,8 @@
+#ifndef INC_GERMAN_GOODBYE_HPP
+#define INC_GERMAN_GOODBYE_HPP
+
+namespace german {
+  void say_goodbye();
+}
+
+#endif
@@ -0,0 +1,8 @@
+#include "english/goodbye.hpp"
+#include "german/goodbye.hpp"
+
+int main() {
+  english::say_goodbye();
+  german::say_goodbye();
+  return 0;
+}
@@ -0,0 +1,7 @@
+#include "hello.hpp"
+
+#include <iostream>
+
+void say_hello() {
+  std::cout << "Hello, world!" << std::endl;
+}
@@ -0,0 +1,6 @@
+#include "hello.hpp"
+
+int main() {
+  say_hello();
+  return 0;
+}
@@ -0,0 +1,6 @@
+#include "header.hpp"
+
+int main() {
+  message();
+  return 0;
+}
@@ -0,0 +1,24 @@
+import unittest
+
+from bfg9000 import builtins
+from bfg9000.builtins import find, packages, rules, subdir, version
+
+class TestBuiltins(unittest.TestCase):
+    def test_modules(self):
+        # Scanning the source should find every builtin, along with the module
+        # that defines it, or we won't be able to load it lazily.
+        modules = builtins._get_builtin_modules()
+        self.assertEqual(sorted(modules), sorted(builtins._all_builtins))
+        for k, v in modules.iteritems():
+            self.assertTrue(k in vars(globals()[v]))
+
+    def test_bind(self):
+        env = object()
+        bound = builtins.bind(build_inputs=None, env=env)
+        self.assertTrue(bound['env'] is env)
+        self.assertEqual(sorted(i for i in bound if i != 'env'),
+                         sorted(builtins._get_builtin_modules()))
+        self.assertEqual(bound['bfg9000_required_version'](), None)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from bfg9000.driver import preparse_args
+
+class TestPreparseArgs(unittest.TestCase):
+    def test_timings(self):
+        self.assertEqual(preparse_args([]).timings, None)
+        self.assertEqual(preparse_args(['--timings']).timings, '-')
+        self.assertEqual(preparse_args(['--timings=out.json']).timings,
+                         'out.json')
+
+    def test_timings_positional(self):
+        # A following positional argument is the source directory, not the
+        # file to write to.
+        self.assertEqual(preparse_args(['--timings', 'src', 'build'])
+                         .timings, '-')
+
+    def test_memory_report(self):
+        self.assertEqual(preparse_args([]).memory_report, None)
+        self.assertEqual(preparse_args(['--memory-report']).memory_report,
+                         '-')
+        self.assertEqual(preparse_args(['--memory-report=out.json'])
+                         .memory_report, 'out.json')
+        self.assertEqual(preparse_args(['--memory-report', 'src', 'build'])
+                         .memory_report, '-')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bfg9000.environment import Environment
+from bfg9000.path import Path
+
+class TestProbe(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = Environment('bfg9000', 'make', Path('src'), Path('build'),
+                               {})
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def probe(self, **kwargs):
+        def fn():
+            self.calls += 1
+            return self.calls
+        return self.env.probe('name', fn, **kwargs)
+
+    def test_cached(self):
+        self.assertEqual(self.probe(), 1)
+        self.assertEqual(self.probe(), 1)
+
+    def test_variables(self):
+        self.env.variables['VAR'] = 'foo'
+        self.assertEqual(self.probe(variables=['VAR']), 1)
+        self.assertEqual(self.probe(variables=['VAR']), 1)
+        self.env.variables['VAR'] = 'bar'
+        self.assertEqual(self.probe(variables=['VAR']), 2)
+
+    def test_paths(self):
+        self.assertEqual(self.probe(paths=[self.tmpdir]), 1)
+        self.assertEqual(self.probe(paths=[self.tmpdir]), 1)
+
+        os.utime(self.tmpdir, (0, 0))
+        self.assertEqual(self.probe(paths=[self.tmpdir]), 2)
+        self.assertEqual(self.probe(paths=[self.tmpdir]), 2)
+
+        shutil.rmtree(self.tmpdir)
+        self.assertEqual(self.probe(paths=[self.tmpdir]), 3)
+        os.mkdir(self.tmpdir)
+
+    def test_record(self):
+        self.probe()
+        with self.env.record_probes() as probes:
+            self.probe()
+            self.env.probe('other', lambda: 'other')
+        self.assertEqual(sorted(probes), ['name', 'other'])
+        self.assertEqual(probes['name']['result'], 1)
+
+    def test_restore(self):
+        with self.env.record_probes() as probes:
+            self.probe(paths=[self.tmpdir])
+
+        env = Environment('bfg9000', 'make', Path('src'), Path('build'), {})
+        self.assertTrue(env.restore_probes(probes))
+        self.assertEqual(env.probe('name', lambda: 2, paths=[self.tmpdir]), 1)
+
+        os.utime(self.tmpdir, (0, 0))
+        env = Environment('bfg9000', 'make', Path('src'), Path('build'), {})
+        self.assertFalse(env.restore_probes(probes))
+        self.assertEqual(env.probe('name', lambda: 2, paths=[self.tmpdir]), 2)
+
+    def test_save_load(self):
+        libdir = os.path.join(self.tmpdir, 'lib')
+        os.mkdir(libdir)
+        self.assertEqual(self.probe(paths=[libdir]), 1)
+        self.env.save(self.tmpdir)
+
+        self.env = Environment.load(self.tmpdir)
+        self.assertEqual(self.probe(paths=[libdir]), 1)
+        os.utime(libdir, (0, 0))
+        self.assertEqual(self.probe(paths=[libdir]), 2)
+
+    def test_prune(self):
+        self.probe()
+        self.env.probe('other', lambda: 'other')
+        self.env.prune_probes()
+        self.env.save(self.tmpdir)
+
+        env = Environment.load(self.tmpdir)
+        self.assertEqual(env.probe('other', lambda: 'new'), 'other')
+        env.prune_probes()
+        env.save(self.tmpdir)
+
+        env = Environment.load(self.tmpdir)
+        self.assertEqual(env.probe('other', lambda: 'new'), 'other')
+        self.assertEqual(env.probe('name', lambda: 'new'), 'new')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,404 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from bfg9000 import builtins
+from bfg9000.builtins.find import *
+from bfg9000.builtins.find import _filter_kind, _find_files, _iter_find
+from bfg9000.platforms import platform_info
+from bfg9000.timings import timer
+
+class TestFind(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.srcdir, 'dir', 'sub'))
+        for i in ['a.cpp', 'dir/b.cpp', 'dir/sub/c.cpp']:
+            with open(os.path.join(self.srcdir, i), 'w'):
+                pass
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+
+    def path(self, *args):
+        return os.path.join(self.srcdir, *args)
+
+    def test_recursive(self):
+        self.assertEqual(sorted(find(self.srcdir, '*.cpp', 'f')), [
+            self.path('a.cpp'), self.path('dir', 'b.cpp'),
+            self.path('dir', 'sub', 'c.cpp'),
+        ])
+
+    def test_flat(self):
+        self.assertEqual(find(self.srcdir, '*', flat=True), [
+            self.srcdir, self.path('dir'), self.path('a.cpp')
+        ])
+
+    def test_dirs(self):
+        self.assertEqual(sorted(find(self.srcdir, '*', 'd')), [
+            self.srcdir, self.path('dir'), self.path('dir', 'sub')
+        ])
+
+    def test_multiple_patterns(self):
+        with open(self.path('dir', 'd.hpp'), 'w'):
+            pass
+        self.assertEqual(find(self.srcdir, ['*.hpp', 'c.*'], 'f'), [
+            self.path('dir', 'd.hpp'), self.path('dir', 'sub', 'c.cpp'),
+        ])
+
+    def test_recursive_glob(self):
+        self.assertEqual(find(self.srcdir, 'dir/**/*.cpp', 'f'), [
+            self.path('dir', 'b.cpp'), self.path('dir', 'sub', 'c.cpp'),
+        ])
+        self.assertEqual(find(self.srcdir, '**/sub/*.cpp', 'f'), [
+            self.path('dir', 'sub', 'c.cpp'),
+        ])
+        self.assertEqual(find(self.srcdir, 'dir/*.cpp', 'f'), [
+            self.path('dir', 'b.cpp'),
+        ])
+
+    def test_no_patterns(self):
+        self.assertEqual(find(self.srcdir, []), [])
+
+    def test_trailing_slash(self):
+        top = os.path.join(self.srcdir, '')
+        self.assertEqual(find(top, 'dir/sub/*.cpp', 'f'), [
+            self.path('dir', 'sub', 'c.cpp'),
+        ])
+
+    def test_parallel(self):
+        self.assertEqual(find(self.srcdir, jobs=4),
+                         find(self.srcdir, jobs=1))
+
+    def test_parallel_filter(self):
+        def filter(name, type):
+            return name != 'sub'
+        self.assertEqual(
+            list(_iter_find(self.srcdir, '*', None, False, filter, set(), 4)),
+            list(_iter_find(self.srcdir, '*', None, False, filter, set(), 1))
+        )
+
+    def test_parallel_filter_deps(self):
+        # Directories the filter rejects shouldn't be listed ahead of time,
+        # or their ignore files would end up in the dependencies.
+        with open(self.path('dir', 'sub', '.gitignore'), 'w'):
+            pass
+
+        def filter(name, type):
+            return name != 'dir'
+
+        def seen(jobs):
+            seen_dirs = set()
+            list(_iter_find(self.srcdir, '*', None, False, filter, seen_dirs,
+                            jobs, ignore_file='.gitignore'))
+            return seen_dirs
+
+        self.assertEqual(seen(4), set([self.srcdir]))
+        self.assertEqual(seen(4), seen(1))
+
+    @unittest.skipIf(not hasattr(os, 'symlink'), 'symlinks not supported')
+    def test_symlinked_dir(self):
+        os.symlink(self.path('dir'), self.path('link'))
+        self.assertEqual(sorted(find(self.srcdir, '*', 'd')), [
+            self.srcdir, self.path('dir'), self.path('dir', 'sub'),
+            self.path('link'),
+        ])
+
+class TestPrune(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        for i in ['.git', 'build', 'src/gen', 'vendor']:
+            os.makedirs(self.path(i))
+        for i in ['.git/a.cpp', 'build/.bfg_environ', 'build/b.cpp',
+                  'src/c.cpp', 'src/d.cpp', 'src/gen/e.cpp', 'vendor/f.cpp']:
+            self.write(i)
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+
+    def path(self, *args):
+        return os.path.join(self.srcdir, *args)
+
+    def write(self, name, data=''):
+        with open(self.path(name), 'w') as f:
+            f.write(data)
+
+    def find(self, **kwargs):
+        return sorted(os.path.relpath(i, self.srcdir)
+                      for i in find(self.srcdir, '*.cpp', 'f', **kwargs))
+
+    def test_default(self):
+        self.assertEqual(self.find(), [
+            'src/c.cpp', 'src/d.cpp', 'src/gen/e.cpp', 'vendor/f.cpp'
+        ])
+
+    def test_exclude(self):
+        self.assertEqual(self.find(exclude=['vendor', 'src/gen', 'd.*']),
+                         ['src/c.cpp'])
+
+    def test_exclude_trailing_slash(self):
+        self.assertEqual(
+            sorted(os.path.relpath(i, self.srcdir) for i in find(
+                os.path.join(self.srcdir, ''), '*.cpp', 'f',
+                exclude=['src/gen']
+            )),
+            ['src/c.cpp', 'src/d.cpp', 'vendor/f.cpp']
+        )
+
+    def test_ignore_file(self):
+        self.write('.gitignore', '# comment\nvendor/\n/src/*.cpp\n' +
+                   '!d.cpp\n')
+        self.assertEqual(self.find(ignore_file='.gitignore'),
+                         ['src/d.cpp', 'src/gen/e.cpp'])
+
+    def test_nested_ignore_file(self):
+        self.write('src/.gitignore', 'gen\n')
+        self.assertEqual(self.find(ignore_file='.gitignore'), [
+            'src/c.cpp', 'src/d.cpp', 'vendor/f.cpp'
+        ])
+
+    def test_depfile(self):
+        self.write('.gitignore', 'vendor/\n')
+        seen_dirs = _find_files(self.srcdir, '*.cpp', 'f', False, None,
+                                ignore_file='.gitignore')[1]
+        self.assertEqual(sorted(os.path.relpath(i, self.srcdir)
+                                for i in seen_dirs),
+                         ['.', '.gitignore', 'src', 'src/gen'])
+
+def _has_git():
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.call(['git', '--version'], stdout=devnull) == 0
+    except OSError:
+        return False
+
+@unittest.skipIf(not _has_git(), 'git not available')
+class TestGitIndex(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        os.makedirs(self.path('src', 'sub'))
+        os.makedirs(self.path('untracked'))
+        for i in ['a.cpp', 'src/b.cpp', 'src/sub/c.cpp', 'src/d.hpp',
+                  'untracked/e.cpp']:
+            with open(self.path(i), 'w'):
+                pass
+        self.git('init', '-q')
+        self.git('add', 'a.cpp', 'src')
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+
+    def path(self, *args):
+        return os.path.join(self.srcdir, *args)
+
+    def git(self, *args):
+        subprocess.check_call(['git'] + list(args), cwd=self.srcdir)
+
+    def find(self, path=None, version=None):
+        if version:
+            self.git('update-index', '--index-version', str(version))
+        results, seen = _find_files(path or self.srcdir, '*.cpp', 'f', False,
+                                    None, engine='git')
+        return sorted(os.path.relpath(i, self.srcdir) for i in results), seen
+
+    def test_tracked(self):
+        for version in [2, 3, 4]:
+            self.assertEqual(self.find(version=version)[0],
+                             ['a.cpp', 'src/b.cpp', 'src/sub/c.cpp'])
+
+    def test_subdir(self):
+        self.assertEqual(self.find(self.path('src'))[0],
+                         ['src/b.cpp', 'src/sub/c.cpp'])
+
+    def test_untracked_fallback(self):
+        self.assertEqual(self.find(self.path('untracked'))[0],
+                         ['untracked/e.cpp'])
+
+    def test_deps(self):
+        seen = self.find()[1]
+        self.assertEqual(seen, set([self.path('.git', 'index')]))
+
+    def test_not_a_repo(self):
+        shutil.rmtree(self.path('.git'))
+        self.assertEqual(self.find()[0], [
+            'a.cpp', 'src/b.cpp', 'src/sub/c.cpp', 'untracked/e.cpp'
+        ])
+
+class TestDirCache(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        self.cachefile = os.path.join(self.srcdir, dircache_name)
+        self.dir = os.path.join(self.srcdir, 'dir')
+        os.mkdir(self.dir)
+        self.touch('a.cpp')
+        self.age()
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+
+    def touch(self, name):
+        with open(os.path.join(self.dir, name), 'a'):
+            pass
+
+    def age(self):
+        os.utime(self.dir, (1000000000, 1000000000))
+
+    def new_cache(self):
+        cache = DirCache()
+        cache.attach(self.cachefile)
+        return cache
+
+    def test_reuse(self):
+        cache = self.new_cache()
+        self.assertEqual(cache.listdir(self.dir), ([], ['a.cpp'], set()))
+        cache.save()
+
+        # Sneak a file in without changing the mtime to see that we're really
+        # using the cached listing.
+        self.touch('b.cpp')
+        self.age()
+        cache = self.new_cache()
+        self.assertEqual(cache.listdir(self.dir), ([], ['a.cpp'], set()))
+
+    def test_changed(self):
+        cache = self.new_cache()
+        cache.listdir(self.dir)
+        cache.save()
+
+        self.touch('b.cpp')
+        cache = self.new_cache()
+        self.assertEqual(sorted(cache.listdir(self.dir)[1]),
+                         ['a.cpp', 'b.cpp'])
+
+    def test_recently_modified(self):
+        self.touch('b.cpp')
+        cache = self.new_cache()
+        cache.listdir(self.dir)
+        cache.save()
+        self.assertFalse(os.path.exists(self.cachefile))
+
+    def test_contains(self):
+        cache = self.new_cache()
+        cache.listdir(self.dir)
+        cache.save()
+
+        # As above, the cached listing should answer this without a stat.
+        self.touch('b.cpp')
+        self.age()
+        cache = self.new_cache()
+        self.assertTrue(cache.contains(self.dir, 'a.cpp'))
+        self.assertFalse(cache.contains(self.dir, 'b.cpp'))
+
+        os.utime(self.dir, None)
+        self.assertTrue(cache.contains(self.dir, 'b.cpp'))
+
+    def test_count(self):
+        sub = os.path.join(self.dir, 'sub')
+        os.mkdir(sub)
+        os.utime(sub, (1000000000, 1000000000))
+        self.age()
+        cache = self.new_cache()
+        cache.listdir(self.dir)
+        cache.listdir(sub)
+        self.assertEqual(cache.count(self.dir), 0)
+        cache.save()
+
+        cache = self.new_cache()
+        self.assertEqual(cache.count(self.srcdir), 2)
+        self.assertEqual(cache.count(self.dir), 2)
+        self.assertEqual(cache.count(self.dir + '/'), 2)
+        self.assertEqual(cache.count(sub), 1)
+        self.assertEqual(cache.count(self.dir + 'x'), 0)
+
+    def test_detached(self):
+        cache = DirCache()
+        cache.listdir(self.dir)
+        cache.save()
+        self.assertFalse(os.path.exists(self.cachefile))
+
+class TestQueryFile(unittest.TestCase):
+    def setUp(self):
+        self.srcdir = tempfile.mkdtemp()
+        self.bfgfile = os.path.join(self.srcdir, 'build.bfg')
+        self.queryfile = os.path.join(self.srcdir, queryfile_name)
+        for i in ['build.bfg', 'a.cpp', 'b.txt']:
+            self.touch(i)
+
+    def tearDown(self):
+        shutil.rmtree(self.srcdir)
+
+    def touch(self, name):
+        with open(os.path.join(self.srcdir, name), 'a'):
+            pass
+
+    def write(self, filter=None):
+        name = '*.cpp'
+        results, seen_dirs = _find_files(self.srcdir, name, 'f', False,
+                                         None)
+        write_queryfile(self.queryfile, 'Makefile', [self.bfgfile], [{
+            'path': self.srcdir, 'name': name, 'type': 'f', 'flat': False,
+            'filter': filter, 'exclude': None, 'ignore_file': None,
+            'engine': 'walk', 'results': results,
+        }], seen_dirs)
+
+    def test_unchanged(self):
+        self.write()
+        self.assertEqual(check_queryfile(self.queryfile, None), 'Makefile')
+
+    def test_unrelated_file(self):
+        self.write()
+        self.touch('c.txt')
+        self.assertEqual(check_queryfile(self.queryfile, None), 'Makefile')
+
+    def test_new_match(self):
+        self.write()
+        self.touch('c.cpp')
+        self.assertEqual(check_queryfile(self.queryfile, None), None)
+
+    def test_new_dir(self):
+        self.write()
+        os.mkdir(os.path.join(self.srcdir, 'sub'))
+        self.assertEqual(check_queryfile(self.queryfile, None), None)
+
+    def test_bfgfile_changed(self):
+        self.write()
+        with open(self.bfgfile, 'w') as f:
+            f.write('# changed\n')
+        self.assertEqual(check_queryfile(self.queryfile, None), None)
+
+    def test_custom_filter(self):
+        self.write(filter='custom')
+        self.assertEqual(check_queryfile(self.queryfile, None), None)
+
+    def test_missing(self):
+        self.assertEqual(check_queryfile(self.queryfile, None), None)
+
+class TestFilterKind(unittest.TestCase):
+    class MockEnv(object):
+        platform = platform_info()
+
+    def test_default(self):
+        env = self.MockEnv()
+        self.assertEqual(_filter_kind(env, filter_by_platform)[1], 'platform')
+        self.assertEqual(_filter_kind(env, None)[1], None)
+        self.assertEqual(_filter_kind(env, lambda name, type: True)[1],
+                         'custom')
+
+    def test_bound(self):
+        # Passing filter_by_platform explicitly from a build.bfg file should
+        # be the same as using the default.
+        env = self.MockEnv()
+        for enabled in [False, True]:
+            old_enabled = timer.enabled
+            timer.enabled = enabled
+            try:
+                bound = builtins.bind(build_inputs=None, env=env)
+            finally:
+                timer.enabled = old_enabled
+            self.assertEqual(
+                _filter_kind(env, bound['filter_by_platform'])[1], 'platform'
+            )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bfg9000 import fs_cache
+from bfg9000.fs_cache import FilesystemCache
+
+class TestFilesystemCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.tmpdir, 'dir'))
+        self.touch('file', 'contents')
+        self.cache = FilesystemCache()
+        self.cache.enabled = True
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, *args):
+        return os.path.join(self.tmpdir, *args)
+
+    def touch(self, name, data=''):
+        with open(self.path(name), 'w') as f:
+            f.write(data)
+
+    def test_listdir(self):
+        self.assertEqual(self.cache.listdir(self.tmpdir),
+                         (['dir'], ['file'], set()))
+        self.touch('new')
+        self.assertEqual(self.cache.listdir(self.tmpdir),
+                         (['dir'], ['file'], set()))
+
+        self.cache.clear()
+        self.assertEqual(sorted(self.cache.listdir(self.tmpdir)[1]),
+                         ['file', 'new'])
+
+    def test_listdir_copies(self):
+        self.cache.listdir(self.tmpdir)[0].append('bad')
+        self.assertEqual(self.cache.listdir(self.tmpdir)[0], ['dir'])
+
+    def test_listdir_missing(self):
+        self.assertEqual(self.cache.listdir(self.path('missing')),
+                         ([], [], set()))
+
+    @unittest.skipIf(not hasattr(os, 'symlink'), 'symlinks not supported')
+    def test_listdir_impls(self):
+        os.symlink(self.path('dir'), self.path('link'))
+        expected = (['dir', 'link'], ['file'], set(['link']))
+        listing = fs_cache._listdir(self.tmpdir)
+        self.assertEqual((sorted(listing[0]), listing[1], listing[2]),
+                         expected)
+        listing = fs_cache._plain_listdir(self.tmpdir)
+        self.assertEqual((sorted(listing[0]), listing[1], listing[2]),
+                         expected)
+
+    def test_exists(self):
+        self.assertTrue(self.cache.exists(self.path('file')))
+        self.assertTrue(self.cache.exists(self.path('dir')))
+        self.assertFalse(self.cache.exists(self.path('missing')))
+        self.assertFalse(self.cache.exists(self.path('missing', 'file')))
+
+        # The parent directory's listing is remembered.
+        self.touch('new')
+        self.assertFalse(self.cache.exists(self.path('new')))
+
+    @unittest.skipIf(not hasattr(os, 'symlink'), 'symlinks not supported')
+    def test_dangling_symlink(self):
+        os.symlink(self.path('missing'), self.path('link'))
+        self.assertFalse(self.cache.exists(self.path('link')))
+
+    def test_isdir_isfile(self):
+        self.assertTrue(self.cache.isdir(self.path('dir')))
+        self.assertFalse(self.cache.isdir(self.path('file')))
+        self.assertTrue(self.cache.isfile(self.path('file')))
+        self.assertFalse(self.cache.isfile(self.path('dir')))
+        self.assertFalse(self.cache.isfile(self.path('missing')))
+
+    def test_read(self):
+        self.assertEqual(self.cache.read(self.path('file')), 'contents')
+        self.touch('file', 'changed')
+        self.assertEqual(self.cache.read(self.path('file')), 'contents')
+        self.assertRaises(IOError, self.cache.read, self.path('missing'))
+
+    def test_disabled(self):
+        self.cache.enabled = False
+        self.assertFalse(self.cache.exists(self.path('new')))
+        self.touch('new', 'contents')
+        self.assertTrue(self.cache.exists(self.path('new')))
+        self.assertEqual(sorted(self.cache.listdir(self.tmpdir)[1]),
+                         ['file', 'new'])
+        self.assertEqual(self.cache.read(self.path('new')), 'contents')
+
+if __name__ == '__main__':
+    unittest.main()
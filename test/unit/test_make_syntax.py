@@ -0,0 +1,61 @@
+import unittest
+from cStringIO import StringIO
+
+from bfg9000.backends.make import syntax
+from bfg9000.backends.make.syntax import *
+from bfg9000.path import Path, Root
+from bfg9000.safe_str import escaped_str, jbos
+
+class TestWriter(unittest.TestCase):
+    def write(self, thing, syntax):
+        out = Writer(StringIO())
+        out.write(thing, syntax)
+        return out.stream.getvalue()
+
+    def test_escape_str(self):
+        self.assertEqual(Writer.escape_str('a b#$', Syntax.target),
+                         'a\\ b\\#$$')
+        self.assertEqual(Writer.escape_str('a|b%', Syntax.target), 'a|b\\%')
+        self.assertEqual(Writer.escape_str('a|b%', Syntax.dependency),
+                         'a\\|b\\%')
+        self.assertEqual(Writer.escape_str('a,b', Syntax.function), 'a$,b')
+        self.assertEqual(Writer.escape_str('a b$', Syntax.shell), 'a b$$')
+        self.assertRaises(ValueError, Writer.escape_str, 'a\nb',
+                          Syntax.shell)
+
+    def test_write_string(self):
+        self.assertEqual(self.write('a b', Syntax.target), 'a\\ b')
+        self.assertEqual(self.write('a b', Syntax.shell), "'a b'")
+        self.assertEqual(self.write('a b', Syntax.clean), 'a b')
+        self.assertEqual(self.write('a,b c', Syntax.function), "'a$,b c'")
+
+    def test_write_path(self):
+        self.assertEqual(self.write(Path('a b'), Syntax.target), 'a\\ b')
+        self.assertEqual(self.write(Path('a b'), Syntax.shell), "'./a b'")
+        self.assertEqual(self.write(Path('a b', Root.srcdir), Syntax.shell),
+                         "'$(srcdir)/a b'")
+
+    def test_write_jbos(self):
+        thing = jbos('-I', Path('inc', Root.srcdir))
+        self.assertEqual(self.write(thing, Syntax.shell), "-I'$(srcdir)/inc'")
+        thing = jbos('a b', escaped_str('$(X)'))
+        self.assertEqual(self.write(thing, Syntax.shell), "'a b'$(X)")
+
+    def test_cached(self):
+        for i in range(2):
+            self.assertEqual(self.write('a b', Syntax.target), 'a\\ b')
+            self.assertEqual(self.write('a b', Syntax.shell), "'a b'")
+            self.assertRaises(ValueError, self.write, 'a\nb', Syntax.shell)
+
+    def test_cache_size(self):
+        old_size = syntax._escape_string.size
+        syntax._escape_string.size = 2
+        try:
+            for i in range(5):
+                self.write('foo{}'.format(i), Syntax.target)
+                self.assertTrue(len(syntax._escape_string.cache) <= 2)
+        finally:
+            syntax._escape_string.size = old_size
+
+if __name__ == '__main__':
+    unittest.main()
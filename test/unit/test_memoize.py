@@ -0,0 +1,27 @@
+import unittest
+
+from bfg9000.memoize import bounded_memoize
+
+class TestBoundedMemoize(unittest.TestCase):
+    def test_memoize(self):
+        calls = []
+
+        @bounded_memoize(10)
+        def fn(x, y):
+            calls.append((x, y))
+            return x + y
+
+        self.assertEqual(fn(1, 2), 3)
+        self.assertEqual(fn(1, 2), 3)
+        self.assertEqual(fn(2, 1), 3)
+        self.assertEqual(calls, [(1, 2), (2, 1)])
+        self.assertEqual(fn.__name__, 'fn')
+
+    def test_size(self):
+        fn = bounded_memoize(2)(lambda x: x)
+        for i in range(5):
+            self.assertEqual(fn(i), i)
+            self.assertTrue(len(fn.cache) <= 2)
+
+if __name__ == '__main__':
+    unittest.main()
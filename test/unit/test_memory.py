@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from cStringIO import StringIO
+
+from bfg9000 import memory
+from bfg9000.memory import *
+from bfg9000.path import Path, Root
+
+class TestMemoryTracker(unittest.TestCase):
+    def test_disabled(self):
+        t = MemoryTracker()
+        t.snapshot('execute')
+        self.assertEqual(t.report()['snapshots'], {})
+
+    def test_start(self):
+        t = MemoryTracker()
+        t.start()
+        try:
+            self.assertTrue(t.enabled)
+        finally:
+            if memory.tracemalloc:
+                memory.tracemalloc.stop()
+
+    def test_snapshot(self):
+        t = MemoryTracker(top=1)
+        t.enabled = True
+        # Hold onto a Path so that there's at least one to count.
+        path = Path('foo', Root.srcdir)
+        t.snapshot('execute')
+
+        snapshot = t.report()['snapshots']['execute']
+        types = snapshot['types']
+        # The largest type, plus any tracked types that are around.
+        self.assertTrue(len(types) >= 2)
+        self.assertGreaterEqual(types['Path']['count'], 1)
+        self.assertGreater(types['Path']['size'], 0)
+        self.assertFalse(set(types.keys()[1:]) - set(tracked_types))
+        self.assertEqual('sites' in snapshot, memory.tracemalloc is not None)
+
+    def test_snapshot_order(self):
+        t = MemoryTracker(top=0)
+        t.enabled = True
+        for i in ['execute', 'generate']:
+            t.snapshot(i)
+        self.assertEqual(list(t.report()['snapshots']),
+                         ['execute', 'generate'])
+
+    def test_report(self):
+        t = MemoryTracker()
+        report = t.report()
+        self.assertEqual(report['version'], MemoryTracker.version)
+        if memory.resource:
+            self.assertGreater(report['max_rss'], 0)
+        else:
+            self.assertEqual(report['max_rss'], None)
+
+class TestMemoryDump(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.tracker = MemoryTracker(top=0)
+        self.tracker.enabled = True
+        self.tracker.snapshot('execute')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_dump_file(self):
+        path = os.path.join(self.tmpdir, 'memory.json')
+        self.tracker.dump(path)
+        with open(path) as f:
+            data = json.load(f)
+        self.assertEqual(data['version'], MemoryTracker.version)
+        self.assertEqual(list(data['snapshots']), ['execute'])
+
+    def test_dump_stdout(self):
+        old_stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.tracker.dump()
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = old_stdout
+        self.assertTrue(output.endswith('\n'))
+        self.assertEqual(json.loads(output)['version'], MemoryTracker.version)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from cStringIO import StringIO
+
+from bfg9000.backends.ninja import syntax
+from bfg9000.backends.ninja.syntax import *
+from bfg9000.path import Path, Root
+
+class TestWriter(unittest.TestCase):
+    def write(self, thing, syntax):
+        out = Writer(StringIO())
+        out.write(thing, syntax)
+        return out.stream.getvalue()
+
+    def test_escape_str(self):
+        self.assertEqual(Writer.escape_str('a: b$', Syntax.output),
+                         'a$:$ b$$')
+        self.assertEqual(Writer.escape_str('a: b$', Syntax.input), 'a:$ b$$')
+        self.assertEqual(Writer.escape_str('a: b$', Syntax.shell), 'a: b$$')
+        self.assertRaises(ValueError, Writer.escape_str, 'a\nb',
+                          Syntax.shell)
+
+    def test_write_string(self):
+        self.assertEqual(self.write('a b', Syntax.output), 'a$ b')
+        self.assertEqual(self.write('a b', Syntax.shell), "'a b'")
+        self.assertEqual(self.write('a b', Syntax.clean), 'a b')
+
+    def test_write_path(self):
+        self.assertEqual(self.write(Path('a b'), Syntax.input), 'a$ b')
+        self.assertEqual(self.write(Path('a b'), Syntax.shell), "'./a b'")
+        self.assertEqual(self.write(Path('a b', Root.srcdir), Syntax.shell),
+                         "'$srcdir/a b'")
+
+    def test_cache_size(self):
+        old_size = syntax._escape_string.size
+        syntax._escape_string.size = 2
+        try:
+            for i in range(5):
+                self.write('foo{}'.format(i), Syntax.output)
+                self.assertTrue(len(syntax._escape_string.cache) <= 2)
+        finally:
+            syntax._escape_string.size = old_size
+
+class TestNinjaFile(unittest.TestCase):
+    def setUp(self):
+        self.ninja = NinjaFile()
+        self.ninja.rule('command', command=var('cmd'))
+
+    def write(self):
+        out = StringIO()
+        self.ninja.write(out)
+        return out.getvalue()
+
+    def test_commands(self):
+        self.ninja.build('foo', 'command', variables={
+            'cmd': Commands([['touch', 'foo']])
+        })
+        self.ninja.build('bar', 'command', variables={
+            'cmd': Commands([['touch', 'bar']])
+        })
+        self.assertEqual(self.write(),
+                         'rule command\n' +
+                         '  command = $cmd\n' +
+                         '\n' +
+                         'build foo: command\n' +
+                         '  cmd = touch foo\n' +
+                         'build bar: command\n' +
+                         '  cmd = touch bar\n')
+
+    def test_shared_commands(self):
+        self.ninja.variable('cmd_1', 'value')
+        for i in ['foo', 'bar']:
+            self.ninja.build(i, 'command', variables={
+                'cmd': Commands([['generate', 'foo', 'bar']])
+            })
+        self.assertEqual(self.write(),
+                         'cmd_1 = value\n' +
+                         '\n' +
+                         'cmd_2 = generate foo bar\n' +
+                         '\n' +
+                         'rule command\n' +
+                         '  command = $cmd\n' +
+                         '\n' +
+                         'build foo: command\n' +
+                         '  cmd = $cmd_2\n' +
+                         'build bar: command\n' +
+                         '  cmd = $cmd_2\n')
+
+if __name__ == '__main__':
+    unittest.main()
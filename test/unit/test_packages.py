@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bfg9000.builtins import packages
+from bfg9000.builtins.packages import (boost_package, pkg_config_package,
+                                       PackageResolutionError)
+from bfg9000.environment import Environment
+from bfg9000.path import Path
+from bfg9000.platforms import which
+
+# Load the C builder now, since it's normally imported lazily, and other tests
+# may have changed the working directory by the time we need it.
+import bfg9000.tools.c_family
+
+def _has_pkg_config():
+    try:
+        which('pkg-config')
+        return True
+    except IOError:
+        return False
+
+def touch(path, data=''):
+    with open(path, 'w') as f:
+        f.write(data)
+
+class TestBoostPackage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.incdir = os.path.join(self.tmpdir, 'include')
+        self.libdir = os.path.join(self.tmpdir, 'lib')
+        os.makedirs(os.path.join(self.incdir, 'boost'))
+        os.mkdir(self.libdir)
+        self.write_version('1_55')
+
+        self.env = Environment('bfg9000', 'make', Path('src'), Path('build'),
+                               {})
+        self.env.variables['BOOST_ROOT'] = self.tmpdir
+        for i in ['thread', 'system']:
+            touch(self.env.linker('c', 'shared_library').output_file(
+                os.path.join(self.libdir, 'boost_' + i)
+            ).link.path.string())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_version(self, version):
+        touch(os.path.join(self.incdir, 'boost', 'version.hpp'),
+              '#define BOOST_LIB_VERSION "{}"\n'.format(version))
+
+    def find(self, *args, **kwargs):
+        return boost_package.bind(env=self.env)(*args, **kwargs)
+
+    def test_find(self):
+        pkg = self.find(['thread', 'system'])
+        self.assertEqual(str(pkg.version), '1.55')
+        self.assertEqual([i.path.string() for i in pkg.system_includes],
+                         [self.incdir])
+        self.assertEqual([i.path.parent().string() for i in pkg.libraries],
+                         [self.libdir] * 2)
+
+    def test_version(self):
+        self.find('thread', version='>=1.50')
+        self.assertRaises(ValueError, self.find, 'thread', version='>=1.60')
+
+    def test_missing_library(self):
+        self.assertRaises(ValueError, self.find, 'nonexist')
+
+    def test_cached(self):
+        self.find('thread')
+        read = packages._boost_version
+        packages._boost_version = None
+        try:
+            self.assertEqual(str(self.find('system').version), '1.55')
+        finally:
+            packages._boost_version = read
+
+    def test_version_changed(self):
+        self.find('thread')
+        self.write_version('1_60')
+        os.utime(os.path.join(self.incdir, 'boost', 'version.hpp'), (0, 0))
+        self.assertEqual(str(self.find('thread').version), '1.60')
+
+@unittest.skipIf(not _has_pkg_config(), 'pkg-config not available')
+class TestPkgConfigPackage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pcdir = os.path.join(self.tmpdir, 'pkgconfig')
+        self.libdir = os.path.join(self.tmpdir, 'lib')
+        os.mkdir(self.pcdir)
+        os.mkdir(self.libdir)
+
+        self.env = Environment('bfg9000', 'make', Path('src'), Path('build'),
+                               {})
+        self.env.variables['PKG_CONFIG_PATH'] = self.pcdir
+        self.env.variables['PKG_CONFIG_LIBDIR'] = self.pcdir
+
+        self.write_pc('foo', '-I${prefix}/include/foo', '-lfoo')
+        self.write_pc('bar', '-I${prefix}/include/bar', '-lbar -lfoo')
+        for i in ['foo', 'bar']:
+            for mode in ['shared_library', 'static_library']:
+                touch(self.env.linker('c', mode).output_file(
+                    os.path.join(self.libdir, i)
+                ).link.path.string())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_pc(self, name, cflags, libs):
+        touch(os.path.join(self.pcdir, name + '.pc'),
+              'prefix={}\n\n'.format(self.tmpdir) +
+              'Name: {}\nDescription: {}\nVersion: 1.0\n'.format(name, name) +
+              'Cflags: {}\nLibs: -L${{prefix}}/lib {}\n'.format(cflags, libs))
+
+    def find(self, *args, **kwargs):
+        return pkg_config_package.bind(env=self.env)(*args, **kwargs)
+
+    def test_single(self):
+        pkg = self.find('foo')
+        self.assertEqual([i.path.string() for i in pkg.system_includes],
+                         [os.path.join(self.tmpdir, 'include', 'foo')])
+        self.assertEqual([i.path.parent().string() for i in pkg.libraries],
+                         [self.libdir])
+        self.assertEqual([i.string() for i in pkg.lib_dirs], [self.libdir])
+
+    def test_multiple(self):
+        pkg = self.find('foo', 'bar')
+        self.assertEqual(len(pkg.system_includes), 2)
+        self.assertEqual(len(pkg.libraries), 2)
+
+    def test_not_found(self):
+        self.assertRaises(PackageResolutionError, self.find, 'nonexist')
+
+    def test_other_flags(self):
+        self.write_pc('baz', '-DBAZ=1 -pthread -I${prefix}/include/baz',
+                      '-pthread -lfoo')
+        pkg = self.find('baz')
+        self.assertEqual(pkg.compile_options, ['-DBAZ=1', '-pthread'])
+        self.assertEqual(pkg.link_options, ['-pthread'])
+        self.assertEqual(len(pkg.system_includes), 1)
+        self.assertEqual(len(pkg.libraries), 1)
+
+    def test_library_order(self):
+        # Some versions of pkg-config repeat libraries for static links, and
+        # the order matters, so keep them just as they are.
+        def run_pkg_config(env, args):
+            if '--libs' in args:
+                return 0, '-L{} -lfoo -lbar -lfoo'.format(self.libdir), ''
+            return 0, '', ''
+
+        run = packages._run_pkg_config
+        packages._run_pkg_config = run_pkg_config
+        try:
+            pkg = self.find('foo', static=True)
+        finally:
+            packages._run_pkg_config = run
+        self.assertEqual([i.path.basename() for i in pkg.libraries],
+                         ['libfoo.a', 'libbar.a', 'libfoo.a'])
+
+    def test_relative_path(self):
+        self.write_pc('baz', '-Iinclude', '-lfoo')
+        self.assertRaises(PackageResolutionError, self.find, 'baz')
+
+    def test_missing_library(self):
+        self.write_pc('baz', '', '-lnonexist')
+        self.assertRaises(PackageResolutionError, self.find, 'baz')
+
+    def test_unicode_variables(self):
+        self.env.variables = {unicode(k): unicode(v) for k, v in
+                              self.env.variables.iteritems()}
+        self.env.variables[u'UNRELATED'] = u'caf\xe9'
+        self.assertEqual(len(self.find('foo').libraries), 1)
+
+    def test_cached(self):
+        self.find('foo')
+        # Don't run pkg-config again unless something changed.
+        run = packages._run_pkg_config
+        packages._run_pkg_config = None
+        try:
+            self.assertEqual(len(self.find('foo').libraries), 1)
+        finally:
+            packages._run_pkg_config = run
+
+    def test_pc_file_changed(self):
+        self.find('foo')
+        self.write_pc('foo', '-I${prefix}/include/changed', '-lfoo')
+        os.utime(os.path.join(self.pcdir, 'foo.pc'), (0, 0))
+        self.assertEqual(self.find('foo').system_includes[0].path.string(),
+                         os.path.join(self.tmpdir, 'include', 'changed'))
+
+class TestPkgConfigMissing(unittest.TestCase):
+    def test_missing(self):
+        env = Environment('bfg9000', 'make', Path('src'), Path('build'), {})
+        env.variables['PKG_CONFIG'] = '/nonexistent/pkg-config'
+        env.variables.pop('PKG_CONFIG_LIBDIR', None)
+        self.assertRaises(ValueError, pkg_config_package.bind(env=env),
+                          'foo')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
+import cPickle as pickle
+import gc
 import os
 import unittest
+import weakref
 
+from bfg9000 import path
 from bfg9000.path import *
 from bfg9000.platforms import platform_name
 
@@ -60,6 +64,35 @@ class TestPath(unittest.TestCase):
         self.assertEqual(p.realize(path_variables), '.')
         self.assertEqual(p.realize(path_variables, executable=True), '.')
 
+    def test_realize_variables_changed(self):
+        p = Path('foo', Root.srcdir)
+        self.assertEqual(p.realize(path_variables),
+                         os.path.join('$(srcdir)', 'foo'))
+        self.assertEqual(p.realize({Root.srcdir: '$(other)'}),
+                         os.path.join('$(other)', 'foo'))
+        self.assertEqual(p.realize(path_variables),
+                         os.path.join('$(srcdir)', 'foo'))
+
+    def test_interned(self):
+        self.assertTrue(Path('foo/bar', Root.srcdir) is
+                        Path('foo/./bar', Root.srcdir))
+        self.assertFalse(Path('foo', Root.srcdir) is
+                         Path('foo', Root.builddir))
+        self.assertTrue(Path('/foo', Root.srcdir) is
+                        Path('/foo', Root.absolute))
+        self.assertRaises(ValueError, Path, 'foo', Root.absolute)
+        self.assertFalse(hasattr(Path('foo'), '__dict__'))
+
+    def test_interned_unused(self):
+        ref = weakref.ref(Path('unused/./path', Root.srcdir))
+        gc.collect()
+        self.assertTrue(ref() is None)
+
+    def test_pickle(self):
+        p = Path('foo/bar', Root.srcdir)
+        self.assertTrue(pickle.loads(pickle.dumps(p, -1)) is p)
+        self.assertTrue(pickle.loads(pickle.dumps(p)) is p)
+
     def test_parent(self):
         p = Path('foo/bar', Root.srcdir)
         self.assertEqual(p.parent(), Path('foo', Root.srcdir))
@@ -78,6 +111,25 @@ class TestPath(unittest.TestCase):
         p = Path('foo', Root.srcdir)
         self.assertEqual(p.addext('.txt'), Path('foo.txt', Root.srcdir))
 
+    def test_relpath(self):
+        p = Path('foo/bar', Root.srcdir)
+        self.assertEqual(p.relpath(Path('foo', Root.srcdir)), 'bar')
+        self.assertEqual(p.relpath(Path('baz', Root.srcdir)),
+                         os.path.join('..', 'foo', 'bar'))
+        self.assertEqual(p.relpath(Path('foo', Root.srcdir)), 'bar')
+        self.assertRaises(ValueError, p.relpath, Path('foo', Root.builddir))
+
+    def test_relpath_cache_size(self):
+        old_size = path._relpath.size
+        path._relpath.size = 2
+        try:
+            start = Path('foo', Root.srcdir)
+            for i in range(5):
+                Path('bar{}'.format(i), Root.srcdir).relpath(start)
+                self.assertTrue(len(path._relpath.cache) <= 2)
+        finally:
+            path._relpath.size = old_size
+
     def test_basename(self):
         p = Path('foo/bar', Root.srcdir)
         self.assertEqual(p.basename(), 'bar')
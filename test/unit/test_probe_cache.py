@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from bfg9000.probe_cache import *
+
+class TestProbeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.exe = os.path.join(self.tmpdir, 'tool')
+        with open(self.exe, 'w') as f:
+            f.write('v1')
+        self.cachefile = os.path.join(self.tmpdir, 'cache', 'probes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lookup(self):
+        cache = ProbeCache()
+        self.assertEqual(cache.lookup('key', self.exe), None)
+        cache.store('key', self.exe, 'result')
+        self.assertEqual(cache.lookup('key', self.exe), 'result')
+
+    def test_reprobe(self):
+        cache = ProbeCache()
+        cache.store('key', self.exe, 'result')
+        cache.reprobe = True
+        self.assertEqual(cache.lookup('key', self.exe), None)
+
+    def test_invalidate(self):
+        cache = ProbeCache()
+        cache.store('key', self.exe, 'result')
+        with open(self.exe, 'w') as f:
+            f.write('version 2')
+        self.assertEqual(cache.lookup('key', self.exe), None)
+
+    def test_save_load(self):
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        cache.store('key', self.exe, 'result')
+        cache.save()
+
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        self.assertEqual(cache.lookup('key', self.exe), 'result')
+
+    def test_save_missing_dir(self):
+        cache = ProbeCache()
+        cache.attach(self.cachefile)
+        cache.store('key', self.exe, 'result')
+        cache.save()
+        self.assertFalse(os.path.exists(os.path.dirname(self.cachefile)))
+
+    def test_save_unshared(self):
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        cache.save()
+        self.assertTrue(os.path.exists(self.cachefile + '.lock'))
+
+        localfile = os.path.join(self.tmpdir, 'local')
+        cache = ProbeCache()
+        cache.attach(localfile)
+        cache.store('key', self.exe, 'result')
+        cache.save()
+        self.assertTrue(os.path.exists(localfile))
+        self.assertFalse(os.path.exists(localfile + '.lock'))
+
+    @unittest.skipIf(os.name == 'nt', 'POSIX permissions only')
+    def test_save_mode(self):
+        old_umask = os.umask(0o022)
+        try:
+            localfile = os.path.join(self.tmpdir, 'local')
+            cache = ProbeCache()
+            cache.attach(self.cachefile, shared=True)
+            cache.attach(localfile)
+            cache.store('key', self.exe, 'result')
+            cache.save()
+        finally:
+            os.umask(old_umask)
+
+        mode = lambda path: os.stat(path).st_mode & 0o777
+        self.assertEqual(mode(self.cachefile), 0o600)
+        self.assertEqual(mode(localfile), 0o644)
+
+        # Keep the existing mode when replacing a file.
+        os.chmod(localfile, 0o664)
+        cache = ProbeCache()
+        cache.attach(localfile)
+        cache.store('key2', self.exe, 'result')
+        cache.save()
+        self.assertEqual(mode(localfile), 0o664)
+
+    def test_save_merge(self):
+        for i in ['key1', 'key2']:
+            cache = ProbeCache()
+            cache.attach(self.cachefile, shared=True)
+            cache.store(i, self.exe, i)
+            cache.save()
+
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        self.assertEqual(cache.lookup('key1', self.exe), 'key1')
+        self.assertEqual(cache.lookup('key2', self.exe), 'key2')
+
+    def test_concurrent_save(self):
+        script = ('import sys\n' +
+                  'from bfg9000.probe_cache import ProbeCache\n' +
+                  'cache = ProbeCache()\n' +
+                  'cache.attach(sys.argv[1], shared=True)\n' +
+                  'cache.store(sys.argv[3], sys.argv[2], sys.argv[3])\n' +
+                  'cache.save()\n')
+        keys = ['key{}'.format(i) for i in range(8)]
+        procs = [subprocess.Popen([sys.executable, '-c', script,
+                                   self.cachefile, self.exe, i])
+                 for i in keys]
+        for i in procs:
+            self.assertEqual(i.wait(), 0)
+
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        for i in keys:
+            self.assertEqual(cache.lookup(i, self.exe), i)
+
+    def test_prefetch(self):
+        cache = ProbeCache()
+        args = [sys.executable, '-c', 'print("result")']
+        cache.prefetch(args)
+        self.assertEqual(cache.check_output(args), 'result\n')
+        self.assertEqual(cache.lookup(json.dumps(args), sys.executable),
+                         'result\n')
+
+    def test_prefetch_unused(self):
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        args = [sys.executable, '-c', 'print("result")']
+        cache.prefetch(args)
+        cache.save()
+
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        self.assertEqual(cache.lookup(json.dumps(args), sys.executable),
+                         'result\n')
+
+    def test_non_utf8(self):
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        args = [sys.executable, '-c',
+                'import sys; sys.stdout.write("caf\\xe9")']
+        self.assertEqual(cache.check_output(args), u'caf\ufffd')
+        cache.save()
+
+        cache = ProbeCache()
+        cache.attach(self.cachefile, shared=True)
+        self.assertEqual(cache.lookup(json.dumps(args), sys.executable),
+                         u'caf\ufffd')
+
+    def test_prefetch_error(self):
+        cache = ProbeCache()
+        args = [sys.executable, '-c', 'import sys; sys.exit(1)']
+        cache.prefetch(args)
+        self.assertRaises(subprocess.CalledProcessError, cache.check_output,
+                          args)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from bfg9000 import tools
+from bfg9000.registry import *
+from bfg9000.tools import c_family, install, internal, mkdir_p, patchelf
+
+class TestScanRegistrations(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, name, data):
+        with open(os.path.join(self.tmpdir, name), 'w') as f:
+            f.write(data)
+
+    def test_names(self):
+        self.write('__init__.py', "@thing('init')\n")
+        self.write('a.py', "@thing('foo', 'bar')\nclass Foo(object):\n" +
+                   "    pass\n")
+        self.write('b.py', '@thing\ndef baz():\n    pass\n')
+        self.write('c.txt', "@thing('text')\n")
+        self.assertEqual(scan_registrations(self.tmpdir, re.compile(
+            r'^@thing\((.*)\)', re.M
+        )), {'foo': 'a', 'bar': 'a'})
+        self.assertEqual(scan_registrations(self.tmpdir, re.compile(
+            r'^@thing\n\s*def (\w+)', re.M
+        )), {'baz': 'b'})
+
+    def test_missing(self):
+        self.assertEqual(scan_registrations(
+            os.path.join(self.tmpdir, 'missing'), re.compile('.')
+        ), {})
+
+class TestToolRegistry(unittest.TestCase):
+    def test_builders(self):
+        self.assertEqual(
+            sorted(tools._get_modules(tools._builder_pattern)),
+            sorted(tools._builders)
+        )
+
+    def test_tools(self):
+        # Some tools (e.g. setenv) are only registered on some platforms.
+        self.assertTrue(set(tools._tools) <=
+                        set(tools._get_modules(tools._tool_pattern)))
+
+if __name__ == '__main__':
+    unittest.main()
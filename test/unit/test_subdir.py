@@ -0,0 +1,276 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bfg9000 import probe_cache
+from bfg9000.build_inputs import BuildInputs
+from bfg9000.builtins import subdir
+from bfg9000.builtins.find import _find_files
+from bfg9000.builtins.subdir import FragmentCache
+from bfg9000.environment import Environment
+from bfg9000.path import Path
+from bfg9000.platforms import platform_name
+
+# Load the packages builtins now, since they're normally imported lazily, and
+# these tests change the working directory before they're needed.
+import bfg9000.builtins.packages
+import bfg9000.tools.c_family
+
+class TestFragmentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bfgfile = os.path.join(self.tmpdir, 'build.bfg')
+        self.cachefile = os.path.join(self.tmpdir, '.bfg_subdirs')
+        self.write('# original\n')
+        self.env = Environment('bfg9000', 'make', Path(self.tmpdir),
+                               Path('build'), {})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, data):
+        with open(self.bfgfile, 'w') as f:
+            f.write(data)
+
+    def new_cache(self):
+        cache = FragmentCache()
+        cache.attach(self.cachefile)
+        return cache
+
+    def make_build(self, queries=[], find_dirs=[]):
+        build = BuildInputs()
+        build.bfg_files.append(self.bfgfile)
+        build.find_queries.extend(queries)
+        build.find_dirs.update(find_dirs)
+        build.exports['value'] = 'exported'
+        return build
+
+    def store(self, cache, queries=[], find_dirs=[], probes={}):
+        cache.store('sub', 'env', self.make_build(queries, find_dirs), probes)
+
+    def test_lookup(self):
+        cache = self.new_cache()
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+        self.store(cache)
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+        cache.save()
+        self.assertEqual(cache.lookup('sub', 'env', self.env).exports,
+                         {'value': 'exported'})
+
+    def test_file_changed(self):
+        cache = self.new_cache()
+        self.store(cache)
+        cache.save()
+        self.write('# changed\n')
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+
+    def test_env_changed(self):
+        cache = self.new_cache()
+        self.store(cache)
+        cache.save()
+        self.assertEqual(cache.lookup('sub', 'other', self.env), None)
+
+    def store_probe(self, cache):
+        libdir = os.path.join(self.tmpdir, 'lib')
+        os.mkdir(libdir)
+        with self.env.record_probes() as probes:
+            self.env.probe('libraries', lambda: [libdir], paths=[libdir])
+        self.store(cache, probes=probes)
+        cache.save()
+        return libdir
+
+    def test_probe_changed(self):
+        cache = self.new_cache()
+        libdir = self.store_probe(cache)
+        self.assertNotEqual(cache.lookup('sub', 'env', self.env), None)
+
+        os.utime(libdir, (0, 0))
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+
+    def test_probe_restored(self):
+        cache = self.new_cache()
+        libdir = self.store_probe(cache)
+
+        env = Environment('bfg9000', 'make', Path(self.tmpdir),
+                          Path('build'), {})
+        with env.record_probes() as probes:
+            self.assertNotEqual(cache.lookup('sub', 'env', env), None)
+        self.assertEqual(list(probes), ['libraries'])
+        self.assertEqual(env.probe('libraries', lambda: None, paths=[libdir]),
+                         [libdir])
+
+    def test_backend_changed(self):
+        other = Environment('bfg9000', 'ninja', Path(self.tmpdir),
+                            Path('build'), {})
+        self.assertEqual(self.env.fingerprint(), other.fingerprint())
+
+    def store_find(self, cache):
+        results, seen_dirs = _find_files(self.tmpdir, '*.cpp', 'f', False,
+                                         None)
+        self.store(cache, [{
+            'path': self.tmpdir, 'name': '*.cpp', 'type': 'f', 'flat': False,
+            'filter': None, 'exclude': None, 'ignore_file': None,
+            'engine': 'walk', 'results': results,
+        }], seen_dirs)
+        cache.save()
+
+    def test_find_changed(self):
+        cache = self.new_cache()
+        self.store_find(cache)
+        self.assertNotEqual(cache.lookup('sub', 'env', self.env), None)
+
+        with open(os.path.join(self.tmpdir, 'new.cpp'), 'w'):
+            pass
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+
+    def test_find_new_dir(self):
+        cache = self.new_cache()
+        self.store_find(cache)
+        os.mkdir(os.path.join(self.tmpdir, 'sub'))
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+
+    def test_save_load(self):
+        cache = self.new_cache()
+        self.store(cache)
+        cache.save()
+
+        cache = self.new_cache()
+        self.assertEqual(cache.lookup('sub', 'env', self.env).exports,
+                         {'value': 'exported'})
+
+    def test_save_unpicklable(self):
+        cache = self.new_cache()
+        self.store(cache)
+        build = self.make_build()
+        build.exports['fn'] = lambda: None
+        cache.store('other', 'env', build, {})
+        cache.save()
+
+        cache = self.new_cache()
+        self.assertEqual(cache.lookup('sub', 'env', self.env).exports,
+                         {'value': 'exported'})
+        self.assertEqual(cache.lookup('other', 'env', self.env), None)
+
+    def test_prune_unused(self):
+        cache = self.new_cache()
+        self.store(cache)
+        cache.save()
+
+        cache = self.new_cache()
+        cache.save()
+
+        cache = self.new_cache()
+        self.assertEqual(cache.lookup('sub', 'env', self.env), None)
+
+class TestSubdir(unittest.TestCase):
+    def setUp(self):
+        self.olddir = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        for name, data in [('a', 'def fn():\n    return "a"\nexport(fn=fn)\n'),
+                           ('b', 'export(value="b")\n')]:
+            os.mkdir(name)
+            with open(os.path.join(name, 'build.bfg'), 'w') as f:
+                f.write(data)
+        self.env = Environment('bfg9000', 'make', Path(self.tmpdir),
+                               Path('build'), {})
+
+    def tearDown(self):
+        os.chdir(self.olddir)
+        shutil.rmtree(self.tmpdir)
+
+    def subdir(self, jobs):
+        fn = subdir.subdir.bind(build_inputs=BuildInputs(), env=self.env)
+        a, b = fn('a', 'b', jobs=jobs)
+        self.assertEqual(a['fn'](), 'a')
+        self.assertEqual(b, {'value': 'b'})
+
+    def test_serial(self):
+        self.subdir(1)
+
+    def test_unpicklable_exports(self):
+        self.subdir(2)
+
+class TestNestedSubdir(unittest.TestCase):
+    def setUp(self):
+        self.olddir = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        for name, data in [('a', 'export(value=subdir("a/c")["value"])\n'),
+                           ('b', 'export(value="b")\n'),
+                           ('a/c', 'export(value="c")\n')]:
+            os.mkdir(name)
+            with open(os.path.join(name, 'build.bfg'), 'w') as f:
+                f.write(data)
+        self.env = Environment('bfg9000', 'make', Path(self.tmpdir),
+                               Path('build'), {})
+        self.cachefile = os.path.join(self.tmpdir, '.bfg_subdirs')
+        self.old_cache = subdir.cache
+
+    def tearDown(self):
+        subdir.cache = self.old_cache
+        os.chdir(self.olddir)
+        shutil.rmtree(self.tmpdir)
+
+    def test_parallel(self):
+        # Nested subdirs run in the worker, but should still be cached here.
+        subdir.cache = FragmentCache()
+        subdir.cache.attach(self.cachefile)
+        fn = subdir.subdir.bind(build_inputs=BuildInputs(), env=self.env)
+        self.assertEqual(fn('a', 'b', jobs=2),
+                         [{'value': 'c'}, {'value': 'b'}])
+        subdir.cache.save()
+
+        cache = FragmentCache()
+        cache.attach(self.cachefile)
+        self.assertEqual(cache.lookup(os.path.join('a', 'c'),
+                                      self.env.fingerprint(),
+                                      self.env).exports, {'value': 'c'})
+
+@unittest.skipIf(platform_name() == 'windows', 'needs a system libm')
+class TestSubdirProbes(unittest.TestCase):
+    def setUp(self):
+        self.olddir = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        for name in ['a', 'b']:
+            os.mkdir(name)
+            with open(os.path.join(name, 'build.bfg'), 'w') as f:
+                f.write("export(m=system_package('m'))\n")
+
+        self.old_xdg = os.environ.get('XDG_CACHE_HOME')
+        self.old_cache = probe_cache.cache
+
+    def tearDown(self):
+        probe_cache.cache = self.old_cache
+        if self.old_xdg is None:
+            os.environ.pop('XDG_CACHE_HOME', None)
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.old_xdg
+        os.chdir(self.olddir)
+        shutil.rmtree(self.tmpdir)
+
+    def subdir(self, jobs):
+        # Start from an empty probe cache, with the platform's probes still
+        # running in the background, like a fresh configure would.
+        os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(dir=self.tmpdir)
+        probe_cache.cache = probe_cache.ProbeCache()
+        probe_cache.cache.attach(os.path.join(probe_cache.user_cache_dir(),
+                                              'probes.json'), shared=True)
+
+        env = Environment('bfg9000', 'make', Path(self.tmpdir), Path('build'),
+                          {})
+        env.platform.start_probes()
+        fn = subdir.subdir.bind(build_inputs=BuildInputs(), env=env)
+        with env.record_probes() as probes:
+            a, b = fn('a', 'b', jobs=jobs)
+        self.assertEqual([i.path for i in a['m'].libraries],
+                         [i.path for i in b['m'].libraries])
+        return probes
+
+    def test_parallel(self):
+        self.assertEqual(self.subdir(2), self.subdir(1))
+
+if __name__ == '__main__':
+    unittest.main()
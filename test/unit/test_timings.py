@@ -0,0 +1,61 @@
+import unittest
+
+from bfg9000.timings import *
+
+class TestTimings(unittest.TestCase):
+    def test_disabled(self):
+        t = Timings()
+        with t.timed('phases', 'foo'):
+            pass
+        t.count('edges', 'Compile')
+        fn = lambda: None
+        self.assertIs(t.wrap('builtins', 'fn', fn), fn)
+        self.assertEqual(t.report()['times'], {})
+        self.assertEqual(t.report()['counts'], {})
+
+    def test_timed(self):
+        t = Timings()
+        t.enabled = True
+        for i in range(2):
+            with t.timed('phases', 'foo'):
+                pass
+        entry = t.report()['times']['phases']['foo']
+        self.assertEqual(entry['calls'], 2)
+        self.assertGreaterEqual(entry['wall'], 0)
+        self.assertGreaterEqual(entry['cpu'], 0)
+
+    def test_wrap(self):
+        t = Timings()
+        t.enabled = True
+        fn = t.wrap('builtins', 'add', lambda x, y: x + y)
+        self.assertEqual(fn(1, y=2), 3)
+        self.assertEqual(t.report()['times']['builtins']['add']['calls'], 1)
+
+    def test_count(self):
+        t = Timings()
+        t.enabled = True
+        t.count('edges', 'Compile')
+        t.count('edges', 'Compile', 2)
+        self.assertEqual(t.report()['counts']['edges']['Compile'], 3)
+
+    def test_collect_merge(self):
+        worker = Timings()
+        worker.enabled = True
+        with worker.timed('builtins', 'foo'):
+            pass
+        worker.count('edges', 'Compile')
+        times, counts = worker.collect()
+        self.assertEqual(worker.report()['times'], {})
+        self.assertEqual(worker.report()['counts'], {})
+
+        t = Timings()
+        t.enabled = True
+        with t.timed('builtins', 'foo'):
+            pass
+        t.merge(times, counts)
+        t.merge(times, counts)
+        self.assertEqual(t.report()['times']['builtins']['foo']['calls'], 3)
+        self.assertEqual(t.report()['counts']['edges']['Compile'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
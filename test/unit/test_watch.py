@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from bfg9000.watch import *
+
+def _has_inotify():
+    try:
+        InotifyWatcher().close()
+        return True
+    except Exception:
+        return False
+
+class WatcherTest(object):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bfgfile = os.path.join(self.tmpdir, 'build.bfg')
+        self.touch('build.bfg')
+        self.watcher = self.make_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.tmpdir)
+
+    def touch(self, name, data=''):
+        with open(os.path.join(self.tmpdir, name), 'w') as f:
+            f.write(data)
+
+    def test_new_file(self):
+        self.watcher.watch([self.tmpdir], [])
+        self.touch('new.cpp')
+        self.watcher.wait(debounce=0)
+
+    def test_changed_file(self):
+        self.watcher.watch([], [self.bfgfile])
+        self.touch('build.bfg', 'changed')
+        self.watcher.wait(debounce=0)
+
+@unittest.skipIf(not _has_inotify(), 'inotify not available')
+class TestInotifyWatcher(WatcherTest, unittest.TestCase):
+    def make_watcher(self):
+        return InotifyWatcher()
+
+    def test_unrelated_file(self):
+        self.watcher.watch([], [self.bfgfile])
+        self.touch('other.txt', 'changed')
+        self.assertFalse(any(self.watcher._relevant(*i)
+                             for i in self.watcher._read(0) or []))
+
+class TestPollingWatcher(WatcherTest, unittest.TestCase):
+    def make_watcher(self):
+        return PollingWatcher(interval=0.01)
+
+    mtime = 0
+
+    def touch(self, name, data=''):
+        WatcherTest.touch(self, name, data)
+        # Make sure the mtimes change even on filesystems with a coarse
+        # resolution.
+        self.mtime += 1
+        for i in [os.path.join(self.tmpdir, name), self.tmpdir]:
+            os.utime(i, (self.mtime, self.mtime))
+
+class TestChangedSince(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'build.bfg')
+        with open(self.path, 'w'):
+            pass
+        os.utime(self.path, (1000000000, 1000000000))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_unchanged(self):
+        self.assertFalse(changed_since([self.path], {}, 1000000001))
+        self.assertFalse(changed_since([self.path], mtimes([self.path]),
+                                       1000000001))
+
+    def test_changed(self):
+        self.assertTrue(changed_since([self.path], {}, 1000000000.5))
+        before = {self.path: 999999999.5}
+        self.assertTrue(changed_since([self.path], before, 1000000001))
+
+    def test_saved_same_second(self):
+        # A file saved earlier in the same second that we started shouldn't
+        # count as changed on every pass.
+        os.utime(self.path, (1000000000.25, 1000000000.25))
+        before = mtimes([self.path])
+        self.assertFalse(changed_since([self.path], before, 1000000000.5))
+
+    def test_whole_seconds(self):
+        # With only whole seconds to go on, we can't tell, so check once more
+        # after the clock has moved on.
+        before = mtimes([self.path])
+        self.assertTrue(changed_since([self.path], before, 1000000000.5))
+
+    def test_missing(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        self.assertEqual(mtimes([missing]), {})
+        self.assertFalse(changed_since([missing], {}, 1000000001))
+
+if __name__ == '__main__':
+    unittest.main()